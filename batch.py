@@ -0,0 +1,156 @@
+# Batch runner - plays many seeded, headless games in parallel (one worker process per core) with a bot at the
+# controls, and streams per-run metrics back as JSON lines as each game finishes. for tuning enemy behaviour
+# and spawn rates, see main.DEFAULT_PARAMS for everything that can be swept.
+#
+#   python batch.py --seeds 100                           100 games on the default parameters
+#   python batch.py --grid grid.json --seeds 50 --out runs.jsonl
+#
+# the grid file maps parameter names to lists of values, and every combination gets played on every seed:
+#   {"aggression": [[0.2, 0.5], [0.6, 0.9]], "enemy_spawn_interval": [240, 420]}
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+import main
+
+BOTS = {}
+
+def bot(name):
+    def register(controller):
+        BOTS[name] = controller
+        return controller
+    return register
+
+@bot("idle")
+def idle(sim):
+    return main.Inputs()
+
+# spins on the spot and fires a steady stream
+@bot("spinner")
+def spinner(sim):
+    return main.Inputs(right=True, fire=sim.tick % 6 == 0)
+
+# turns towards the nearest enemy (or rock if there are none), holds range and shoots when roughly lined up
+@bot("hunter")
+def hunter(sim):
+    targets = sim.enemies or sim.rocks
+    if not targets:
+        return main.Inputs()
+    pos = sim.player.phys.pos
+    target = min(targets, key=lambda t: pos.distance_squared_to(t.phys.pos))
+    offset = target.phys.pos - pos
+    diff = (pygame.Vector2(1, 0).angle_to(offset) - sim.player.phys.facing + 180) % 360 - 180
+    dist = offset.length()
+    return main.Inputs(
+        left=diff < -5,
+        right=diff > 5,
+        forward=dist > 350,
+        back=dist < 150,
+        fire=abs(diff) < 12 and sim.tick % 6 == 0,
+    )
+
+
+def init_worker():
+    pygame.init()
+
+# one game, start to finish - runs in a worker process, so everything in and out has to pickle
+def run_game(job):
+    main.PHYSICS_WORLD = job["physics_world"]
+    sim = main.Simulation(job["seed"], job["params"])
+    controller = BOTS[job["bot"]]
+    tick_times = []
+    start = time.perf_counter()
+    while sim.tick < job["ticks"] and not sim.player.is_dead():
+        tick_start = time.perf_counter()
+        sim.step(controller(sim))
+        tick_times.append(time.perf_counter() - tick_start)
+    elapsed = time.perf_counter() - start
+
+    tick_ms = np.asarray(tick_times) * 1000
+    return {
+        "run": job["run"],
+        "seed": job["seed"],
+        "bot": job["bot"],
+        "params": job["params"],
+        "survival_ticks": sim.tick,
+        "survived": not sim.player.is_dead(),
+        "points": sim.points,
+        "kills": sim.kills,
+        "tick_ms": {"mean": float(tick_ms.mean()), "p95": float(np.percentile(tick_ms, 95)), "max": float(tick_ms.max())},
+        "wall_s": elapsed,
+    }
+
+# every combination of the grid's values, on every seed
+def make_jobs(grid, seeds, first_seed, bot, ticks, physics_world=False):
+    names = list(grid)
+    jobs = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = dict(zip(names, values))
+        for seed in range(first_seed, first_seed + seeds):
+            jobs.append({"run": len(jobs), "seed": seed, "params": params, "bot": bot, "ticks": ticks, "physics_world": physics_world})
+    return jobs
+
+def print_summary(results, out=sys.stderr):
+    groups = defaultdict(list)
+    for r in results:
+        groups[json.dumps(r["params"], sort_keys=True)].append(r)
+    print(f"\n{'runs':>5}{'survival':>10}{'survived':>10}{'points':>9}{'kills':>7}{'tick ms':>9}  params", file=out)
+    for params, runs in groups.items():
+        print(f"{len(runs):>5}"
+              f"{np.mean([r['survival_ticks'] for r in runs]):>10.0f}"
+              f"{np.mean([r['survived'] for r in runs]):>10.0%}"
+              f"{np.mean([r['points'] for r in runs]):>9.1f}"
+              f"{np.mean([r['kills'] for r in runs]):>7.2f}"
+              f"{np.mean([r['tick_ms']['mean'] for r in runs]):>9.3f}  {params}", file=out)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--grid", metavar="PATH", help="JSON file of parameter name -> list of values to sweep")
+    parser.add_argument("--seeds", type=int, default=10, help="games per parameter set")
+    parser.add_argument("--first-seed", type=int, default=1)
+    parser.add_argument("--ticks", type=int, default=main.SIM_HZ * 300, help="stop a game after this many ticks if the player is still alive")
+    parser.add_argument("--bot", choices=list(BOTS), default="hunter")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", metavar="PATH", help="write results here as JSON lines instead of to stdout")
+    parser.add_argument("--physics-world", action="store_true", help="run the games with the vectorized physics world")
+    args = parser.parse_args()
+
+    grid = {}
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+        unknown = set(grid) - set(main.DEFAULT_PARAMS)
+        if unknown:
+            parser.error(f"unknown parameters: {', '.join(sorted(unknown))}")
+
+    jobs = make_jobs(grid, args.seeds, args.first_seed, args.bot, args.ticks, args.physics_world)
+    out = open(args.out, "w") if args.out else sys.stdout
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as pool:
+        futures = [pool.submit(run_game, job) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            print(f"\r{len(results)}/{len(jobs)} games", end="", file=sys.stderr, flush=True)
+    elapsed = time.perf_counter() - start
+    if args.out:
+        out.close()
+
+    ticks = sum(r["survival_ticks"] for r in results)
+    print(f"\n{len(results)} games, {ticks} ticks in {elapsed:.1f}s on {args.workers} workers ({ticks / elapsed:.0f} ticks/s)", file=sys.stderr)
+    print_summary(results)
@@ -0,0 +1,319 @@
+# Scenario benchmarks - runs seeded, scripted games under the dummy video driver and reports
+# per-subsystem frame times, entity counts and allocations as JSON.
+#
+#   python bench.py                                  run every scenario, print a summary
+#   python bench.py --out results.json               ...and save the results
+#   python bench.py --compare baseline.json          flag phases that got slower than the baseline
+#   python bench.py --snapshots                      snapshot size and encode/decode times for big worlds
+#   python bench.py --world 40960x40960              every scenario in a scrolling world full of sleeping rocks
+#   python bench.py --governor --budget-ms 4         let the frame governor shed work, and log every step it takes
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+import main
+
+PHASES = ["update_lasers", "update_rocks", "update_debris", "update_scrap", "update_enemies", "integrate", "check_collisions",
+          "update_sector", "draw_window"]
+# phases that only run in some modes, and what has to be on for them to show up
+MODE_PHASES = {"integrate": lambda sim: sim.batched, "update_sector": lambda sim: sim.sector is not None}
+ENTITY_LISTS = ["lasers", "rocks", "debris", "scrap", "enemies"]
+
+SCENARIOS = {}
+
+def scenario(name, seed=1234):
+    def register(setup):
+        SCENARIOS[name] = (setup, seed)
+        return setup
+    return register
+
+# somewhere in the window, wherever the camera is
+def random_pos(sim):
+    x, y = main.camera_origin(sim.player.phys.pos)
+    return (x + random.uniform(0, main.WINDOW_WIDTH), y + random.uniform(0, main.WINDOW_HEIGHT))
+
+def add_enemy(sim, pos):
+    e = sim.enemy_pool.acquire(pos, sim)
+    sim.enemies.append(e)
+    return e
+
+# the player spins on the spot and fires a steady stream, so every scenario has lasers in flight
+def gunner(sim):
+    return main.Inputs(right=True, fire=sim.tick % 6 == 0)
+
+
+@scenario("idle")
+def idle(sim):
+    pass
+
+@scenario("200 rocks")
+def many_rocks(sim):
+    for _ in range(200):
+        sim.rocks.append(main.Rock(random_pos(sim), sim.rng, sim.physics_world))
+
+@scenario("50 enemies dogfighting")
+def dogfight(sim):
+    for _ in range(50):
+        add_enemy(sim, random_pos(sim))
+    for _ in range(10):
+        sim.rocks.append(main.Rock(random_pos(sim), sim.rng, sim.physics_world))
+
+# every rock on screen shatters at once, then a fresh field is dropped in and shattered again every second
+@scenario("mass asteroid shatter with debris storm")
+def shatter_storm(sim):
+    def reseed(sim):
+        if sim.tick % 60 == 0:
+            for _ in range(120):
+                rock = main.Rock(random_pos(sim), sim.rng, sim.physics_world)
+                rock.health.hp = 0
+                sim.rocks.append(rock)
+    return reseed
+
+
+class PhaseTimer:
+    def __init__(self, sim, phases):
+        self.samples = {phase: [] for phase in phases}
+        for phase in phases:
+            setattr(sim, phase, self.wrap(phase, getattr(sim, phase)))
+
+    def wrap(self, phase, method):
+        samples = self.samples[phase]
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = method(*args, **kwargs)
+            samples.append(time.perf_counter() - start)
+            return result
+        return timed
+
+
+def percentiles(samples, scale=1000.0):
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+    arr = np.asarray(samples) * scale
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "mean": float(arr.mean()), "max": float(arr.max())}
+
+# the phases this simulation actually runs - the rest would only ever time at zero
+def active_phases(sim):
+    return [phase for phase in PHASES if phase not in MODE_PHASES or MODE_PHASES[phase](sim)]
+
+def run_scenario(name, frames, warmup=30, governor=False):
+    setup, seed = SCENARIOS[name]
+    random.seed(seed)
+    main.sprite_cache.sprites.clear()
+    main.sprite_cache.reset_stats()
+
+    game = main.GameCtrl(seed)
+    hook = setup(game)
+
+    timer = None
+    frame_times = []
+    alloc_blocks = []
+    counts = {name: [] for name in ENTITY_LISTS}
+    gc_before = sum(s["collections"] for s in gc.get_stats())
+
+    for frame in range(warmup + frames):
+        if frame == warmup:
+            # only start timing once the sprite cache has warmed up
+            timer = PhaseTimer(game, active_phases(game))
+            gc_before = sum(s["collections"] for s in gc.get_stats())
+        if hook:
+            hook(game)
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        game.step(gunner(game))
+        draw_start = time.perf_counter()
+        game.draw_window()
+        elapsed = time.perf_counter() - start
+        pygame.event.pump()
+        if governor and game.governor:
+            game.governor.update({"sim": draw_start - start, "draw": start + elapsed - draw_start})
+
+        if timer:
+            frame_times.append(elapsed)
+            alloc_blocks.append(sys.getallocatedblocks() - blocks)
+            for list_name in ENTITY_LISTS:
+                counts[list_name].append(len(getattr(game, list_name)))
+
+    gc_runs = sum(s["collections"] for s in gc.get_stats()) - gc_before
+    steps, level = [], 0
+    if game.governor:
+        steps = list(game.governor.log)
+        level = game.governor.level()
+        # the sprite cache and health bars are shared, so the next scenario has to start at full quality
+        game.governor.reset()
+    return {
+        "seed": seed,
+        "frames": frames,
+        "frame": percentiles(frame_times),
+        "phases": {phase: percentiles(samples) for phase, samples in timer.samples.items()},
+        "entities": {name: {"mean": float(np.mean(c)), "max": int(np.max(c))} for name, c in counts.items()},
+        "allocations": {
+            "net_blocks_per_frame": percentiles(alloc_blocks, scale=1.0),
+            "gc_collections": gc_runs,
+        },
+        "sprite_cache": main.sprite_cache.stats(),
+        "render": dict(game.render_stats),
+        "pools": game.pool_stats(),
+        "memory": main.memory_report(game),
+        "governor": {"level": level, "steps": steps},
+    }
+
+# a phase regresses when its p95 got worse by more than the threshold, ignoring anything under the noise floor
+def compare(results, baseline, threshold, noise_ms=0.05):
+    regressions = []
+    for name, current in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        rows = [("frame", current["frame"], before["frame"])]
+        rows += [(phase, current["phases"][phase], before["phases"].get(phase)) for phase in current["phases"]]
+        for phase, now, then in rows:
+            if not then:
+                continue
+            if now["p95"] - then["p95"] > noise_ms and now["p95"] > then["p95"] * (1 + threshold):
+                regressions.append((name, phase, then["p95"], now["p95"]))
+    return regressions
+
+# a world with `size` objects spread over every kind, plus a cloud of debris
+def snapshot_world(size, seed=1234):
+    random.seed(seed)
+    sim = main.Simulation(seed)
+    for _ in range(size * 4 // 10):
+        sim.rocks.append(main.Rock(random_pos(sim), sim.rng, sim.physics_world))
+    for _ in range(size * 15 // 100):
+        add_enemy(sim, random_pos(sim))
+    for _ in range(size * 3 // 10):
+        sim.lasers.append(sim.laser_pool.acquire(random_pos(sim), random.uniform(0, 360)))
+    for _ in range(size * 15 // 100):
+        sim.scrap.append(sim.scrap_pool.acquire(random_pos(sim), (0, 0)))
+    sim.debris.emit(random_pos(sim), size)
+    sim.step(main.Inputs())
+    return sim
+
+def snapshot_figures(sizes, repeats=20):
+    figures = {}
+    for size in sizes:
+        sim = snapshot_world(size)
+        encode, decode = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            blob = main.Snapshot.encode(sim)
+            encode.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            main.Snapshot.decode(sim, blob)
+            decode.append(time.perf_counter() - start)
+        # a fresh world has to build every object, rather than overwrite the ones already there
+        fresh = main.Simulation(0)
+        start = time.perf_counter()
+        main.Snapshot.decode(fresh, blob)
+        cold = time.perf_counter() - start
+        figures[size] = {
+            "objects": len(sim.all_objects()),
+            "debris": len(sim.debris),
+            "bytes": len(blob),
+            "encode_ms": percentiles(encode)["p50"],
+            "decode_ms": percentiles(decode)["p50"],
+            "cold_decode_ms": cold * 1000,
+        }
+    return figures
+
+def print_summary(results):
+    for name, r in results["scenarios"].items():
+        print(f"\n{name}  ({r['frames']} frames, seed {r['seed']})")
+        print(f"  {'phase':<18}{'p50':>9}{'p95':>9}{'p99':>9}  ms")
+        for phase, t in [("frame", r["frame"])] + list(r["phases"].items()):
+            print(f"  {phase:<18}{t['p50']:>9.3f}{t['p95']:>9.3f}{t['p99']:>9.3f}")
+        entities = ", ".join(f"{k} {v['mean']:.0f}/{v['max']}" for k, v in r["entities"].items())
+        print(f"  entities (mean/max): {entities}")
+        allocs = r["allocations"]
+        print(f"  net blocks/frame p95: {allocs['net_blocks_per_frame']['p95']:.0f}, gc collections: {allocs['gc_collections']}")
+        for step in r["governor"]["steps"]:
+            print(f"  governor frame {step['frame']}: {step['action']} {step['knob']} -> {step['setting']} (level {step['level']})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--scenario", action="append", help="run only this scenario (repeatable)")
+    parser.add_argument("--list", action="store_true", help="list scenarios and exit")
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against a previous results file")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed p95 slowdown before flagging, as a fraction")
+    parser.add_argument("--snapshots", action="store_true", help="measure snapshot size and encode/decode times and exit")
+    parser.add_argument("--physics-world", action="store_true", help="run with the vectorized physics world")
+    parser.add_argument("--world", metavar="WIDTHxHEIGHT", help="run in a scrolling world this big")
+    parser.add_argument("--governor", action="store_true", help="let the frame governor shed work as it would in the game")
+    parser.add_argument("--budget-ms", type=float, help="frame budget for --governor, instead of main.FRAME_BUDGET")
+    args = parser.parse_args()
+    main.PHYSICS_WORLD = args.physics_world
+    if args.budget_ms:
+        main.FRAME_BUDGET = args.budget_ms / 1000
+    if args.world:
+        # never smaller than the window, same as the game - culling and the sectors assume the view fits in the world
+        try:
+            main.WORLD_WIDTH, main.WORLD_HEIGHT = (max(int(n), size) for n, size in
+                                                   zip(args.world.lower().split("x"), (main.WINDOW_WIDTH, main.WINDOW_HEIGHT)))
+        except ValueError:
+            parser.error("--world takes WIDTHxHEIGHT, e.g. 40960x40960")
+    if args.governor and not main.FRAME_GOVERNOR:
+        parser.error("--governor needs main.FRAME_GOVERNOR on")
+
+    if args.snapshots:
+        pygame.init()
+        print(f"{'objects':>8}{'debris':>8}{'KiB':>9}{'encode':>9}{'decode':>9}{'cold':>9}  ms")
+        for f in snapshot_figures([1000, 5000, 10000]).values():
+            print(f"{f['objects']:>8}{f['debris']:>8}{f['bytes'] / 1024:>9.1f}{f['encode_ms']:>9.2f}{f['decode_ms']:>9.2f}{f['cold_decode_ms']:>9.2f}")
+        sys.exit(0)
+
+    if args.list:
+        for name, (_, seed) in SCENARIOS.items():
+            print(f"{name}  (seed {seed})")
+        sys.exit(0)
+
+    names = args.scenario or list(SCENARIOS)
+    for name in names:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario: {name}")
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "physics_world": args.physics_world,
+            "governor_budget_ms": main.FRAME_BUDGET * 1000 if args.governor else None,
+            "world": [main.WORLD_WIDTH, main.WORLD_HEIGHT],
+        },
+        "scenarios": {name: run_scenario(name, args.frames, governor=args.governor) for name in names},
+        "assets": main.assets.stats(),
+    }
+    print_summary(results)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\nregressions:")
+            for name, phase, before, after in regressions:
+                print(f"  {name} / {phase}: p95 {before:.3f} -> {after:.3f} ms")
+            sys.exit(1)
+        print("\nno regressions")
@@ -1,17 +1,398 @@
 # Complete your game here
 
+import argparse
+import array
+import csv
+import functools
+import gc
+import hashlib
+import json
+import math
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import time
+import tracemalloc
 import pygame
 import random
+import re
+import numpy as np
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
 
 WINDOW_WIDTH = 1280
 WINDOW_HEIGHT = 720
 
+# the playfield - a world bigger than the window scrolls with the player and is cut into CHUNK_SIZE chunks, and only
+# the chunks within WAKE_MARGIN of the view are simulated in full (see Sector). sleeping chunks get a cheap catch-up
+# step every SLEEP_INTERVAL ticks. a big world starts out with WORLD_ROCK_DENSITY rocks per window's worth of area
+WORLD_WIDTH = WINDOW_WIDTH
+WORLD_HEIGHT = WINDOW_HEIGHT
+CHUNK_SIZE = 256
+WAKE_MARGIN = 256
+SLEEP_INTERVAL = 60
+WORLD_ROCK_DENSITY = 10
+
+# the simulation always advances in fixed ticks of SIM_DT, rendering runs as fast as RENDER_FPS allows (0 = uncapped)
+# and interpolates between the last two ticks. after a long frame at most MAX_CATCHUP_STEPS ticks are run to catch up.
+# SIM_HZ is fixed, not a setting: thrust, laser speed, damping, cooldowns, AI timers and spawn intervals are all tuned
+# per tick, so a different rate would change how fast the game plays (and every recording and snapshot with it).
+# it's named for the places that turn ticks into seconds - the loops' clocks, net.py's rates, scrap lifetimes
+SIM_HZ = 60
+SIM_DT = 1.0 / SIM_HZ
+RENDER_FPS = 240
+MAX_CATCHUP_STEPS = 5
+
+# when frames keep taking longer than FRAME_BUDGET seconds of work, the frame governor sheds non-essential work one
+# step at a time: after GOVERNOR_SHED_FRAMES frames over budget in a row, and back again after GOVERNOR_RESTORE_FRAMES
+# frames in a row under GOVERNOR_HEADROOM of it. phase times are smoothed by GOVERNOR_SMOOTHING per frame
+FRAME_GOVERNOR = True
+FRAME_BUDGET = 0.8 * SIM_DT
+GOVERNOR_SHED_FRAMES = 20
+GOVERNOR_RESTORE_FRAMES = 180
+GOVERNOR_HEADROOM = 0.6
+GOVERNOR_SMOOTHING = 0.1
+
+# anything that moved further than this in one tick wrapped around the screen, so it isn't interpolated
+MAX_INTERPOLATION_DISTANCE = 100
+
+# sprite cache tuning - angles are snapped to multiples of the step, pre-baking trades startup time for no misses
+SPRITE_CACHE_SIZE = 4096
+SPRITE_ANGLE_STEP = 3
+SPRITE_SCALE_STEP = 0.05
+PREBAKE_SPRITES = False
+
+# only push the changed parts of the screen to the display while the background isn't scrolling
+DIRTY_RECTS = False
+
+# parallax layers back to front as (image, parallax factor) - everything after the first layer keeps its alpha
+BACKGROUND_LAYERS = [("background.png", 0.2)]
+BACKGROUND_TILE_SIZE = 256
+
+# decoded on ASSET_THREADS threads behind the loading screen, so spawning never has to touch the disk
+SPRITE_ASSETS = ["spaceship.png", "enemyship.png", "asteroid.png", "coin.png"]
+ASSET_THREADS = 4
+
+# integrate every body in one vectorized step over numpy arrays instead of one Vector2 at a time
+PHYSICS_WORLD = False
+
+# decoded background pixels get written here so later launches can map them straight in instead of decoding the PNG
+CACHE_DIR = ".cache"
+
+# hold backspace to rewind through the last REWIND_DEPTH snapshots, taken every REWIND_INTERVAL ticks.
+# F5 / F9 quicksave to and quickload from QUICKSAVE_PATH
+REWIND_INTERVAL = 10
+REWIND_DEPTH = 60
+QUICKSAVE_PATH = "quicksave.snap"
+
+# --split runs the simulation in its own process, publishing each tick's snapshot into one of two shared memory
+# slots this big for the window process to draw from
+SHARED_SLOT_BYTES = 8 << 20
+
+# tunables for enemy behaviour and spawning. (low, high) ranges get rolled per enemy - batch.py sweeps these
+DEFAULT_PARAMS = {
+    "accuracy": (0.2, 0.4),
+    "aggression": (0.4, 0.9),
+    "bravery": (0.3, 0.9),
+    "preferred_range": (220, 420),
+    "fire_range": (280, 520),
+    "rock_spawn_interval": 120,
+    "max_rocks": 10,
+    "enemy_spawn_interval": 420,
+    "max_enemies": 2,
+}
+
+### --- PROFILER --- ###
+# a timing section that can be re-entered every frame without allocating
+class ProfileSection:
+    def __init__(self, profiler: "Profiler", name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        current = self.profiler.current
+        current[self.name] = current.get(self.name, 0.0) + time.perf_counter() - self.start
+
+class NullSection:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+# per-frame phase timings. sections add up over the frame (so Graphics.draw is the total for all sprites),
+# end_frame() closes the frame off into the rolling history and the optional CSV/JSONL stream.
+# while disabled, sections are a shared no-op and timed functions cost one attribute check
+class Profiler:
+    NULL_SECTION = NullSection()
+
+    def __init__(self, history=240):
+        self.enabled = False
+        self.names = []
+        self.sections = {}
+        self.current = {}
+        self.history = deque(maxlen=history)
+        self.frame = 0
+        self.stream = None
+        self.writer = None
+
+    def register(self, name):
+        if name not in self.sections:
+            self.sections[name] = ProfileSection(self, name)
+            self.names.append(name)
+        return self.sections[name]
+
+    def section(self, name):
+        if not self.enabled:
+            return self.NULL_SECTION
+        section = self.sections.get(name)
+        return section if section else self.register(name)
+
+    def timed(self, name=None):
+        def decorate(fn):
+            section = self.register(name or fn.__qualname__)
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with section:
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def end_frame(self, frame_time, counts=None, fps=0.0):
+        if not self.enabled:
+            return
+        sample = {"frame": self.frame, "frame_ms": frame_time * 1000, "fps": fps}
+        for name in self.names:
+            sample[name] = self.current.get(name, 0.0) * 1000
+        if counts:
+            sample.update(counts)
+        self.history.append(sample)
+        self.current = {}
+        self.frame += 1
+
+        if self.stream:
+            if self.writer:
+                self.writer.writerow(sample)
+            else:
+                self.stream.write(json.dumps(sample) + "\n")
+
+    # mean of every numeric field over the rolling history
+    def averages(self):
+        if not self.history:
+            return {}
+        totals = {}
+        for sample in self.history:
+            for key, value in sample.items():
+                totals[key] = totals.get(key, 0) + value
+        return {key: value / len(self.history) for key, value in totals.items()}
+
+    # per-frame samples go to PATH as CSV, or as JSON lines if it ends in .jsonl
+    def open_stream(self, path, count_fields=()):
+        self.close_stream()
+        self.stream = open(path, "w", newline="")
+        if not path.endswith(".jsonl"):
+            fields = ["frame", "frame_ms", "fps"] + self.names + list(count_fields)
+            self.writer = csv.DictWriter(self.stream, fields, restval=0, extrasaction="ignore")
+            self.writer.writeheader()
+        self.enabled = True
+
+    def close_stream(self):
+        if self.stream:
+            self.stream.close()
+        self.stream = None
+        self.writer = None
+
+profiler = Profiler()
+
+### --- RANDOM --- ###
+# every subsystem draws from its own seeded stream, so a given seed + inputs always plays out the same way,
+# and e.g. firing an extra laser doesn't shift which rocks spawn. each Simulation owns one, so two worlds in the
+# same process never draw from each other's streams
+class GameRandom:
+    STREAMS = ("rocks", "enemies", "drops", "physics")
+
+    def __init__(self, seed=0):
+        self.seed(seed)
+
+    def seed(self, seed):
+        self.master_seed = seed
+        for name in self.STREAMS:
+            setattr(self, name, random.Random(f"{seed}:{name}"))
+        self.particles = np.random.default_rng([seed, len(self.STREAMS)])
+
+    @staticmethod
+    def new_seed():
+        return random.SystemRandom().getrandbits(63)
+
+### --- SPRITE CACHE --- ###
+# rotozoom is the most expensive thing we do per sprite, so rotated/scaled copies are kept in an LRU cache
+# keyed by (image key, angle bucket, scale bucket)
+class SpriteCache:
+    def __init__(self, max_size=SPRITE_CACHE_SIZE, angle_step=SPRITE_ANGLE_STEP, scale_step=SPRITE_SCALE_STEP):
+        self.max_size = max_size
+        self.scale_step = scale_step
+        self.sprites = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.set_angle_step(angle_step)
+
+    # changing the step invalidates every cached sprite
+    def set_angle_step(self, angle_step):
+        self.angle_step = angle_step
+        self.angle_buckets = max(1, round(360 / angle_step))
+        self.sprites.clear()
+
+    def get(self, key, img, angle, scale):
+        a = round(angle / self.angle_step) % self.angle_buckets
+        s = round(scale / self.scale_step)
+        cache_key = (key, a, s)
+        sprite = self.sprites.get(cache_key)
+        if sprite is not None:
+            self.hits += 1
+            self.sprites.move_to_end(cache_key)
+            return sprite
+
+        self.misses += 1
+        sprite = pygame.transform.rotozoom(img, -a * self.angle_step, s * self.scale_step)
+        self.sprites[cache_key] = sprite
+        if len(self.sprites) > self.max_size:
+            self.sprites.popitem(last=False)
+        return sprite
+
+    # render every angle bucket up front for the given scales
+    def prebake(self, key, img, scales):
+        for scale in scales:
+            for a in range(self.angle_buckets):
+                self.get(key, img, a * self.angle_step, scale)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self.sprites),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+sprite_cache = SpriteCache()
+
+### --- ASSETS --- ###
+# every image (and background's raw pixels) is decoded exactly once and shared by everything that uses it.
+# preload() hands a list to the thread pool; asking for something still in flight just waits for it, and anything
+# never preloaded is decoded on the spot. images are converted to the display's pixel format if there is one
+class Assets:
+    def __init__(self, threads=ASSET_THREADS):
+        self.threads = threads
+        self.executor = None
+        self.pending = {}   # (kind, path) -> future of (asset, decode ms)
+        self.loaded = {}    # (kind, path) -> asset
+        self.load_ms = {}
+
+    @staticmethod
+    def _decode(kind, path):
+        start = time.perf_counter()
+        asset = pygame.image.load(path) if kind == "image" else load_raw_pixels(path)
+        return asset, (time.perf_counter() - start) * 1000
+
+    def preload(self, kind, paths):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(self.threads, thread_name_prefix="assets")
+        for path in paths:
+            key = (kind, path)
+            if key not in self.loaded and key not in self.pending:
+                self.pending[key] = self.executor.submit(self._decode, kind, path)
+
+    def get(self, kind, path):
+        key = (kind, path)
+        asset = self.loaded.get(key)
+        if asset is None:
+            future = self.pending.pop(key, None)
+            asset, ms = future.result() if future else self._decode(kind, path)
+            # conversion has to happen on the main thread, where the display lives
+            if kind == "image" and pygame.display.get_surface():
+                asset = asset.convert_alpha()
+            self.loaded[key] = asset
+            self.load_ms[key] = ms
+        return asset
+
+    def image(self, path):
+        return self.get("image", path)
+
+    def pixels(self, path):
+        return self.get("pixels", path)
+
+    # (decoded, total) over everything ever asked for
+    def progress(self):
+        done = sum(future.done() for future in self.pending.values())
+        return len(self.loaded) + done, len(self.loaded) + len(self.pending)
+
+    def ready(self):
+        return all(future.done() for future in self.pending.values())
+
+    def wait(self):
+        for kind, path in list(self.pending):
+            self.get(kind, path)
+
+    # one row per asset - raw pixels may be mapped straight from the cache file rather than in memory
+    def stats(self):
+        rows = []
+        for (kind, path), asset in self.loaded.items():
+            if kind == "image":
+                size = asset.get_size()
+                nbytes = asset.get_pitch() * asset.get_height()
+            else:
+                pixels, size = asset
+                nbytes = len(pixels)
+            rows.append({"kind": kind, "path": path, "size": size, "bytes": nbytes, "load_ms": self.load_ms[(kind, path)]})
+        return rows
+
+    def report(self):
+        rows = self.stats()
+        lines = [f"{'asset':<20}{'kind':<8}{'size':>11}{'KiB':>10}{'load ms':>9}"]
+        for r in rows:
+            lines.append(f"{r['path']:<20}{r['kind']:<8}{'%dx%d' % r['size']:>11}{r['bytes'] / 1024:>10.1f}{r['load_ms']:>9.2f}")
+        lines.append(f"{'total':<39}{sum(r['bytes'] for r in rows) / 1024:>10.1f}")
+        return "\n".join(lines)
+
+assets = Assets()
+
 ### --- GRAPHICS --- ###
 class Graphics:
+    __slots__ = ("img", "path", "key", "scale")
+
     def __init__(self, img_path=None, scale=1.0):
-        self.img = pygame.image.load(img_path) if img_path else None
+        self.img = assets.image(img_path) if img_path else None
+        self.path = img_path
+        self.key = img_path
         self.scale = scale
 
+    # images are shared, so this never touches the disk
+    def reset(self, img_path=None, scale=1.0):
+        if img_path != self.path or self.key != img_path:
+            self.img = assets.image(img_path) if img_path else None
+            self.path = img_path
+            self.key = img_path
+        self.scale = scale
+
+    # swap in a modified image - the key has to be unique to it or the sprite cache will hand back the wrong sprite
+    def set_image(self, img, key):
+        self.img = img
+        self.key = key
+
     def get_width(self):
         if self.img:
             return int(self.img.get_width() * self.scale)
@@ -24,44 +405,160 @@ class Graphics:
         if self.img:
             return self.get_width() // 2
     
-    def draw(self, surface, pos, angle=0):
+    @profiler.timed("Graphics.draw")
+    def draw(self, queue: "RenderQueue", layer, pos, angle=0):
         if self.img:
-            sprite = pygame.transform.rotozoom(self.img, -angle, self.scale)
+            if self.key is not None:
+                sprite = sprite_cache.get(self.key, self.img, angle, self.scale)
+            else:
+                sprite = pygame.transform.rotozoom(self.img, -angle, self.scale)
             rect = sprite.get_rect(center=(pos.x, pos.y))
-            surface.blit(sprite, rect.topleft)
+            queue.submit(layer, sprite, rect.topleft)
+
+### --- RENDER QUEUE --- ###
+# draw order, back to front
+LAYER_LASERS = 0
+LAYER_PLAYER = 1
+LAYER_ENEMIES = 2
+LAYER_SCRAP = 3
+LAYER_ROCKS = 4
+LAYER_DEBRIS = 5
+LAYER_BARS = 6
+LAYER_HUD = 7
+RENDER_LAYERS = 8
+
+# everything drawn in a frame gets submitted here as (surface, topleft) per layer in world coordinates, anything
+# outside the view is dropped, and each layer goes out in a single blits call
+class RenderQueue:
+    def __init__(self, width=WINDOW_WIDTH, height=WINDOW_HEIGHT):
+        self.width = width
+        self.height = height
+        self.origin = (0, 0)    # where the window's top left is in the world, see camera_origin()
+        self.layers = [[] for _ in range(RENDER_LAYERS)]
+        self.culled = 0
+        self.stats = {"draw_calls": 0, "blits": 0, "culled": 0}
+
+    def submit(self, layer, surface, pos):
+        x = pos[0] - self.origin[0]
+        y = pos[1] - self.origin[1]
+        if x >= self.width or y >= self.height or x + surface.get_width() <= 0 or y + surface.get_height() <= 0:
+            self.culled += 1
+            return
+        self.layers[layer].append((surface, (x, y)))
+
+    # for callers that have already done their own culling, in screen coordinates
+    def extend(self, layer, entries):
+        self.layers[layer].extend(entries)
+
+    # returns the touched rects when dirty is set, for display.update
+    def flush(self, target, dirty=False):
+        rects = [] if dirty else None
+        fblits = getattr(target, "fblits", None)
+        draw_calls = 0
+        blits = 0
+        for entries in self.layers:
+            if not entries:
+                continue
+            if dirty:
+                rects.extend(target.blits(entries))
+            elif fblits:
+                fblits(entries)
+            else:
+                target.blits(entries, doreturn=False)
+            draw_calls += 1
+            blits += len(entries)
+            entries.clear()
+
+        self.stats = {"draw_calls": draw_calls, "blits": blits, "culled": self.culled}
+        self.culled = 0
+        return rects
 
 ### --- PHYSICS --- ###
 class Physics:
+    __slots__ = ("pos", "vel", "acc", "prev_pos", "mass", "facing", "spin_speed", "spin", "prev_facing",
+                 "wrap_radius", "clamp", "damping", "stop_speed", "max_speed")
+    batched = False
+
     def __init__(self, pos, vel=None, acc=None, mass=1, facing=0, spin_speed=0):
-        self.pos = pygame.math.Vector2(pos)
-        if isinstance(vel, pygame.math.Vector2):
-            self.vel = vel
-        elif isinstance(vel, (tuple, list)):
-            self.vel = pygame.math.Vector2(vel)
-        elif isinstance(vel, (int, float)):
-            self.vel = pygame.math.Vector2(vel, 0)
-        elif vel is None:
-            self.vel = pygame.math.Vector2()
+        self.pos = pygame.math.Vector2()
+        self.vel = pygame.math.Vector2()
+        self.acc = pygame.math.Vector2()
+        self.prev_pos = pygame.math.Vector2()
+        self.reset(pos, vel, acc, mass, facing, spin_speed)
+
+    # re-initialise in place - vectors passed in are copied, never shared
+    def reset(self, pos, vel=None, acc=None, mass=1, facing=0, spin_speed=0):
+        self.pos.update(pos)
+        self.vel.update(self.as_velocity(vel))
+        if acc:
+            self.acc.update(acc)
         else:
-            raise TypeError(f"Invalid type for vel: {type(vel)}")
-        self.acc = pygame.math.Vector2(acc) if acc else pygame.math.Vector2()
+            self.acc.update(0, 0)
         self.mass = mass
         self.facing = facing
         self.spin_speed = spin_speed
         self.spin = 0
+        self.prev_pos.update(self.pos)
+        self.prev_facing = facing
+
+        # limits applied after every move, see apply_limits()
+        self.wrap_radius = None
+        self.clamp = False
+        self.damping = 1.0
+        self.stop_speed = 0.0
+        self.max_speed = math.inf
+
+    # a velocity can be given as a vector, a speed along +x or nothing at all
+    @staticmethod
+    def as_velocity(vel):
+        if isinstance(vel, (pygame.math.Vector2, tuple, list)):
+            return vel
+        elif isinstance(vel, (int, float)):
+            return (vel, 0)
+        elif vel is None:
+            return (0, 0)
+        raise TypeError(f"Invalid type for vel: {type(vel)}")
+
+    # jump straight to a new state, e.g. from a snapshot - nothing gets interpolated across the jump
+    def place(self, pos, vel, facing):
+        self.pos.update(pos)
+        self.vel.update(vel)
+        self.acc.update(0, 0)
+        self.facing = facing
+        self.remember()
+
+    # called at the start of every tick so drawing can blend from here to wherever the tick ends up
+    def remember(self):
+        self.prev_pos.update(self.pos)
+        self.prev_facing = self.facing
+
+    # a plain body holds nothing outside itself - see WorldBody.release
+    def release(self):
+        pass
+
+    def draw_pos(self, alpha):
+        if alpha >= 1 or self.prev_pos.distance_squared_to(self.pos) > MAX_INTERPOLATION_DISTANCE ** 2:
+            return self.pos
+        return self.prev_pos.lerp(self.pos, alpha)
+
+    def draw_facing(self, alpha):
+        if alpha >= 1:
+            return self.facing
+        diff = (self.facing - self.prev_facing + 180) % 360 - 180
+        return self.prev_facing + diff * alpha
 
     def move(self):
         self.vel += self.acc
         self.pos += self.vel
         self.spin = (self.spin + self.facing) % 360
 
-    def handle_collision(self, other: "Physics"):
+    def handle_collision(self, other: "Physics", rng: "GameRandom"):
         if self.mass == 0 or other.mass == 0:
             return
 
         dir = self.pos - other.pos
         if dir.length() == 0:
-            dir = pygame.Vector2(random.uniform(-1, 1), random.uniform(-1, 1))
+            dir = pygame.Vector2(rng.physics.uniform(-1, 1), rng.physics.uniform(-1, 1))
         dir = dir.normalize()
 
         rel_vel = self.vel - other.vel
@@ -83,8 +580,8 @@ class Physics:
         return self.pos.distance_to(other.pos) < radius_self + radius_other
     
     def wrap_position(self, radius):
-        w = WINDOW_WIDTH
-        h = WINDOW_HEIGHT
+        w = WORLD_WIDTH
+        h = WORLD_HEIGHT
         if self.pos.x < -radius:
             self.pos.x = w + radius
         elif self.pos.x > w + radius:
@@ -94,9 +591,452 @@ class Physics:
         elif self.pos.y > h + radius:
             self.pos.y = -radius
 
+    # ships stay inside the world, things with damping slow down (and stop dead under stop_speed), then the speed cap
+    def apply_limits(self):
+        if self.clamp:
+            self.pos.x = max(0, min(WORLD_WIDTH, self.pos.x))
+            self.pos.y = max(0, min(WORLD_HEIGHT, self.pos.y))
+        if self.damping != 1:
+            if self.vel.length() > self.stop_speed:
+                self.vel *= self.damping
+            else:
+                self.vel.update(0, 0)
+        if self.vel.length() > self.max_speed:
+            self.vel.scale_to_length(self.max_speed)
+
+### --- PHYSICS WORLD --- ###
+# every body's physics state as rows of flat numpy arrays, so a tick's integration, wrapping, clamping and damping
+# is one vectorized pass (see PHYSICS_WORLD). every simulation has its own, and rows are handed out and taken
+# back as bodies come and go
+class PhysicsWorld:
+    VECTORS = ("pos", "vel", "acc", "prev_pos")
+    SCALARS = ("mass", "facing", "prev_facing", "spin_speed", "spin", "wrap_radius", "damping", "stop_speed", "max_speed")
+
+    def __init__(self, capacity=256):
+        for name in self.VECTORS:
+            setattr(self, name, np.zeros((capacity, 2)))
+        for name in self.SCALARS:
+            setattr(self, name, np.zeros(capacity))
+        self.clamp = np.zeros(capacity, dtype=bool)
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return len(self.mass) - len(self.free)
+
+    def allocate(self):
+        if not self.free:
+            self._grow()
+        return self.free.pop()
+
+    def release(self, row):
+        self.free.append(row)
+
+    # what one body's row costs across all the arrays
+    def row_bytes(self):
+        return sum(getattr(self, name).nbytes // len(self.mass) for name in self.VECTORS + self.SCALARS + ("clamp",))
+
+    def _grow(self):
+        capacity = len(self.mass)
+        for name in self.VECTORS + self.SCALARS + ("clamp",):
+            old = getattr(self, name)
+            new = np.zeros((capacity * 2,) + old.shape[1:], dtype=old.dtype)
+            new[:capacity] = old
+            setattr(self, name, new)
+        self.free.extend(range(capacity * 2 - 1, capacity - 1, -1))
+
+    def remember(self, rows):
+        self.prev_pos[rows] = self.pos[rows]
+        self.prev_facing[rows] = self.facing[rows]
+
+    # Physics.move, wrap_position and apply_limits for all the given rows at once, plus the spin
+    # that rocks used to apply to themselves
+    def step(self, rows):
+        vel = self.vel[rows] + self.acc[rows]
+        pos = self.pos[rows] + vel
+        facing = self.facing[rows]
+        self.spin[rows] = (self.spin[rows] + facing) % 360
+
+        radius = self.wrap_radius[rows]
+        wraps = radius >= 0
+        clamp = self.clamp[rows]
+        for axis, size in ((0, WORLD_WIDTH), (1, WORLD_HEIGHT)):
+            p = pos[:, axis]
+            low = wraps & (p < -radius)
+            high = wraps & (p > size + radius)
+            p[low] = size + radius[low]
+            p[high] = -radius[high]
+            p[clamp] = np.clip(p[clamp], 0, size)
+
+        damping = self.damping[rows]
+        speed = np.hypot(vel[:, 0], vel[:, 1])
+        vel *= np.where(damping == 1, 1.0, np.where(speed > self.stop_speed[rows], damping, 0.0))[:, None]
+        speed = np.hypot(vel[:, 0], vel[:, 1])
+        max_speed = self.max_speed[rows]
+        over = speed > max_speed
+        if over.any():
+            vel[over] *= (max_speed[over] / speed[over])[:, None]
+
+        spin_speed = self.spin_speed[rows]
+        self.facing[rows] = np.where(spin_speed != 0, (facing + spin_speed) % 360, facing)
+        self.pos[rows] = pos
+        self.vel[rows] = vel
+
+    # the bounce from Physics.handle_collision for a whole contact list. every impulse comes from the velocities
+    # before any were applied, a body in several contacts gets the sum. returns the relative speed of each contact
+    # afterwards, for collision damage
+    def resolve_contacts(self, a, b, rng: "GameRandom", softness=0.5):
+        m1 = self.mass[a]
+        m2 = self.mass[b]
+        normal = self.pos[a] - self.pos[b]
+        length = np.hypot(normal[:, 0], normal[:, 1])
+        stacked = (length == 0) & (m1 != 0) & (m2 != 0)
+        if stacked.any():
+            normal[stacked] = [(rng.physics.uniform(-1, 1), rng.physics.uniform(-1, 1)) for _ in range(int(stacked.sum()))]
+            length = np.hypot(normal[:, 0], normal[:, 1])
+        length[length == 0] = 1
+        normal /= length[:, None]
+
+        along = ((self.vel[a] - self.vel[b]) * normal).sum(axis=1)
+        # only bounce if moving towards each other
+        bounce = (along <= 0) & (m1 != 0) & (m2 != 0)
+        m1, m2, normal, along = m1[bounce], m2[bounce], normal[bounce], along[bounce]
+        impulse = (-(1 + softness) * along) / (1/m1 + 1/m2)
+        np.add.at(self.vel, a[bounce], (impulse / m1)[:, None] * normal)
+        np.subtract.at(self.vel, b[bounce], (impulse / m2)[:, None] * normal)
+
+        rel = self.vel[a] - self.vel[b]
+        return np.hypot(rel[:, 0], rel[:, 1])
+
+def body_rows(objects: list):
+    return np.fromiter((obj.phys.row for obj in objects), np.intp, len(objects))
+
+# an (n, 2) array of where the objects are - straight out of the physics world's arrays if they live there
+def body_positions(objects: list):
+    if objects and objects[0].phys.batched:
+        return objects[0].phys.world.pos[body_rows(objects)]
+    return np.array([(obj.phys.pos.x, obj.phys.pos.y) for obj in objects], dtype=np.float64).reshape(-1, 2)
+
+def _vector_field(name):
+    def get(self):
+        return pygame.Vector2(getattr(self.world, name)[self.row].tolist())
+    def set(self, value):
+        getattr(self.world, name)[self.row] = (value[0], value[1])
+    return property(get, set)
+
+def _scalar_field(name):
+    def get(self):
+        return float(getattr(self.world, name)[self.row])
+    def set(self, value):
+        getattr(self.world, name)[self.row] = value
+    return property(get, set)
+
+# a Physics that keeps its state in a row of the physics world instead of its own attributes. reading a vector
+# gives a copy, so it has to be assigned back (+= and *= do that) - pos.x = ... on one would be lost
+class WorldBody(Physics):
+    __slots__ = ("world", "row")
+    batched = True
+
+    pos = _vector_field("pos")
+    vel = _vector_field("vel")
+    acc = _vector_field("acc")
+    prev_pos = _vector_field("prev_pos")
+    mass = _scalar_field("mass")
+    facing = _scalar_field("facing")
+    prev_facing = _scalar_field("prev_facing")
+    spin_speed = _scalar_field("spin_speed")
+    spin = _scalar_field("spin")
+    damping = _scalar_field("damping")
+    stop_speed = _scalar_field("stop_speed")
+    max_speed = _scalar_field("max_speed")
+
+    def __init__(self, pos, vel=None, acc=None, mass=1, facing=0, spin_speed=0, world=None):
+        self.world = world
+        self.row = world.allocate()
+        self.reset(pos, vel, acc, mass, facing, spin_speed)
+
+    def __del__(self):
+        self.release()
+
+    # hands the row back as soon as the body leaves the simulation - waiting for __del__ means waiting for the owner
+    # to be collected, which a reference cycle can put off. reset() takes a new row for a pooled object coming back
+    def release(self):
+        if self.row is not None:
+            self.world.release(self.row)
+            self.row = None
+
+    @property
+    def clamp(self):
+        return bool(self.world.clamp[self.row])
+
+    @clamp.setter
+    def clamp(self, value):
+        self.world.clamp[self.row] = value
+
+    # stored as -1 for none, so the world can tell with a single comparison
+    @property
+    def wrap_radius(self):
+        radius = self.world.wrap_radius[self.row]
+        return None if radius < 0 else float(radius)
+
+    @wrap_radius.setter
+    def wrap_radius(self, value):
+        self.world.wrap_radius[self.row] = -1 if value is None else value
+
+    def reset(self, pos, vel=None, acc=None, mass=1, facing=0, spin_speed=0):
+        if self.row is None:
+            self.row = self.world.allocate()
+        self.pos = pos
+        self.vel = self.as_velocity(vel)
+        self.acc = acc if acc else (0, 0)
+        self.prev_pos = pos
+        self.mass = mass
+        self.facing = facing
+        self.prev_facing = facing
+        self.spin_speed = spin_speed
+        self.spin = 0
+        self.wrap_radius = None
+        self.clamp = False
+        self.damping = 1.0
+        self.stop_speed = 0.0
+        self.max_speed = math.inf
+
+    def place(self, pos, vel, facing):
+        self.pos = pos
+        self.vel = vel
+        self.acc = (0, 0)
+        self.facing = facing
+        self.remember()
+
+    def remember(self):
+        world = self.world
+        world.prev_pos[self.row] = world.pos[self.row]
+        world.prev_facing[self.row] = world.facing[self.row]
+
+### --- BACKGROUND --- ###
+# raw cache file = header + width * height RGBA bytes. the source's mtime and size are in the header, so editing
+# the PNG invalidates it
+RAW_MAGIC = b"RGBA"
+RAW_HEADER = struct.Struct("<4sIIqQ")
+RAW_HEADER_SIZE = 64
+
+def load_raw_pixels(path):
+    source = os.stat(path)
+    cache_path = os.path.join(CACHE_DIR, os.path.basename(path) + ".rgba")
+    try:
+        with open(cache_path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, width, height, mtime, size = RAW_HEADER.unpack_from(mapped)
+        if (magic == RAW_MAGIC and mtime == source.st_mtime_ns and size == source.st_size
+                and len(mapped) == RAW_HEADER_SIZE + width * height * 4):
+            return memoryview(mapped)[RAW_HEADER_SIZE:], (width, height)
+        mapped.close()
+    except (OSError, ValueError, struct.error):
+        pass
+
+    image = pygame.image.load(path)
+    pixels = pygame.image.tobytes(image, "RGBA")
+    header = RAW_HEADER.pack(RAW_MAGIC, image.get_width(), image.get_height(), source.st_mtime_ns, source.st_size)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache_path + ".tmp", "wb") as f:
+            f.write(header.ljust(RAW_HEADER_SIZE, b"\0"))
+            f.write(pixels)
+        os.replace(cache_path + ".tmp", cache_path)
+    except OSError:
+        pass    # read-only checkout - we just decode every launch
+    return pixels, image.get_size()
+
+# one parallax layer, converted to the display format once and cut into tiles so only the visible ones get blitted
+class BackgroundLayer:
+    def __init__(self, path, parallax, opaque=True, tile_size=BACKGROUND_TILE_SIZE):
+        pixels, (width, height) = assets.pixels(path)
+        image = pygame.image.frombuffer(pixels, (width, height), "RGBA")
+        if pygame.display.get_surface():
+            image = image.convert() if opaque else image.convert_alpha()
+
+        self.parallax = parallax
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.tiles = []
+        for y in range(0, height, tile_size):
+            row = []
+            for x in range(0, width, tile_size):
+                rect = pygame.Rect(x, y, min(tile_size, width - x), min(tile_size, height - y))
+                row.append(image.subsurface(rect).copy())
+            self.tiles.append(row)
+
+    # the layer scrolls with the focus point, and repeats in every direction for worlds bigger than it
+    def offset(self, focus):
+        return int(focus.x * self.parallax) % self.width, int(focus.y * self.parallax) % self.height
+
+    # draws the tiles that overlap area (the whole window by default), returns how many were blitted
+    def draw(self, surface, offset, area=None):
+        area = pygame.Rect(area) if area else surface.get_rect()
+        view = area.move(offset)
+        size = self.tile_size
+        entries = []
+        # once the view runs off the layer's right or bottom edge it picks up the tiles from the other side
+        for ry in range(view.top // self.height, (view.bottom - 1) // self.height + 1):
+            for rx in range(view.left // self.width, (view.right - 1) // self.width + 1):
+                left = rx * self.width
+                top = ry * self.height
+                tx0, tx1 = max(0, (view.left - left) // size), min(len(self.tiles[0]) - 1, (view.right - left - 1) // size)
+                ty0, ty1 = max(0, (view.top - top) // size), min(len(self.tiles) - 1, (view.bottom - top - 1) // size)
+                entries += [(self.tiles[ty][tx], (left + tx * size - offset[0], top + ty * size - offset[1]))
+                            for ty in range(ty0, ty1 + 1) for tx in range(tx0, tx1 + 1)]
+        surface.set_clip(area)
+        surface.blits(entries, doreturn=False)
+        surface.set_clip(None)
+        return len(entries)
+
+class Background:
+    def __init__(self, layers=BACKGROUND_LAYERS):
+        self.layers = [BackgroundLayer(path, parallax, opaque=(i == 0)) for i, (path, parallax) in enumerate(layers)]
+
+    def offsets(self, focus):
+        return tuple(layer.offset(focus) for layer in self.layers)
+
+    # returns (draw calls, tiles blitted)
+    def draw(self, surface, offsets, area=None):
+        tiles = 0
+        for layer, offset in zip(self.layers, offsets):
+            tiles += layer.draw(surface, offset, area)
+        return len(self.layers), tiles
+
+### --- HUD --- ###
+# rendered strings, so a value flipping back and forth (or two elements showing the same text) is only built once.
+# a string is built from glyph runs - every digit is rendered once on its own and the text between digits is cached
+# as a run, so "Points: 41" -> "Points: 42" costs a few blits rather than rasterising the whole string again
+class TextCache:
+    RUNS = re.compile(r"\d|\D+")
+
+    def __init__(self, font, max_size=256):
+        self.font = font
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.runs = OrderedDict()
+        self.renders = 0
+
+    def _cached(self, cache, key, make):
+        surface = cache.get(key)
+        if surface is None:
+            surface = make()
+            cache[key] = surface
+            if len(cache) > self.max_size:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        return surface
+
+    def run(self, text, colour):
+        return self._cached(self.runs, (text, colour), lambda: self._rasterise(text, colour))
+
+    def _rasterise(self, text, colour):
+        self.renders += 1
+        return self.font.render(text, True, colour)
+
+    def render(self, text, colour=(255,255,255)):
+        return self._cached(self.surfaces, (text, colour), lambda: self._assemble(text, colour))
+
+    def _assemble(self, text, colour):
+        runs = [self.run(part, colour) for part in self.RUNS.findall(text)]
+        if len(runs) < 2:
+            return runs[0] if runs else self._rasterise(text, colour)
+        surface = pygame.Surface((sum(run.get_width() for run in runs), max(run.get_height() for run in runs)), pygame.SRCALPHA)
+        x = 0
+        for run in runs:
+            # runs never overlap and the surface starts out clear, so taking the max copies each one exactly
+            surface.blit(run, (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            x += run.get_width()
+        return surface
+
+# one HUD element, placed by one of the pygame Rect anchors (topleft, midbottom, ...)
+class HudElement:
+    def __init__(self, pos, anchor="topleft"):
+        self.pos = pos
+        self.anchor = anchor
+        self.value = None
+        self.surface = None
+
+    def rect(self):
+        return self.surface.get_rect(**{self.anchor: self.pos})
+
+# elements only re-render when their value changes, and each one is blitted where it sits - so with DIRTY_RECTS
+# the HUD only ever dirties its own elements' rects, never the whole window
+class Hud:
+    def __init__(self, font):
+        self.text = TextCache(font)
+        self.elements = {}
+        self.entries = []
+        self.dirty = True
+        self.rebuilds = 0
+
+    def add(self, name, pos, anchor="topleft"):
+        self.elements[name] = HudElement(pos, anchor)
+        self.dirty = True
+
+    def remove(self, name):
+        if self.elements.pop(name, None):
+            self.dirty = True
+
+    def set_text(self, name, text, colour=(255,255,255)):
+        element = self.elements[name]
+        if element.value != (text, colour):
+            element.value = (text, colour)
+            element.surface = self.text.render(text, colour)
+            self.dirty = True
+
+    # for elements that draw themselves, like the profiler panel - pass a new surface when it has changed
+    def set_image(self, name, surface):
+        element = self.elements[name]
+        if element.surface is not surface:
+            element.value = None
+            element.surface = surface
+            self.dirty = True
+
+    def compose(self):
+        self.entries = [(element.surface, element.rect().topleft) for element in self.elements.values() if element.surface]
+        self.dirty = False
+        self.rebuilds += 1
+
+    # the HUD is pinned to the window, so it goes round the camera
+    def draw(self, queue: "RenderQueue"):
+        if self.dirty:
+            self.compose()
+        queue.extend(LAYER_HUD, self.entries)
+
+# health bars pre-drawn per (width, fill bucket) - the bar only ever shows `buckets` distinct fill levels
+class HealthBarCache:
+    def __init__(self, buckets=32, height=6):
+        self.buckets = buckets
+        self.height = height
+        self.bars = {}
+        # the frame governor turns bars off when frames run long
+        self.enabled = True
+
+    def get(self, width, ratio):
+        bucket = round(max(0, min(1, ratio)) * self.buckets)
+        bar = self.bars.get((width, bucket))
+        if bar is None:
+            fill_width = int(width * bucket / self.buckets)
+            bar = pygame.Surface((width, self.height))
+            pygame.draw.rect(bar, (60,60,60), (0, 0, width, self.height))
+            pygame.draw.rect(bar, (0,220,0), (0, 0, fill_width, self.height))
+            pygame.draw.rect(bar, (0,0,0), (0, 0, width, self.height), 1)
+            self.bars[(width, bucket)] = bar
+        return bar
+
+health_bars = HealthBarCache()
+
 ### --- HEALTH --- ###
 class Health:
+    __slots__ = ("max_hp", "hp", "is_visible")
+
     def __init__(self, max_hp, is_visible):
+        self.reset(max_hp, is_visible)
+
+    def reset(self, max_hp, is_visible):
         self.max_hp = max_hp
         self.hp = max_hp
         self.is_visible = is_visible
@@ -107,36 +1047,72 @@ class Health:
     def __repr__(self):
         return f"max hp: {self.max_hp}\ncurrent hp: {self.hp}\nis health bar visible: {self.is_visible}"
 
-    def draw_bar(self, surface, object: "GameObject"):
-        bar_width = self.max_hp
-        bar_height = 6
+    def draw_bar(self, queue: "RenderQueue", object: "GameObject", pos):
+        if not health_bars.enabled:
+            return
+        bar_width = int(self.max_hp)
 
-        x = int(object.phys.pos.x - bar_width // 2)
-        y = int(object.phys.pos.y - object.get_radius() - 16)
+        x = int(pos.x - bar_width // 2)
+        y = int(pos.y - object.get_radius() - 16)
 
-        hp_ratio = max(0, min(1, self.hp / self.max_hp))
-        fill_width = int(bar_width * hp_ratio)
+        queue.submit(LAYER_BARS, health_bars.get(bar_width, self.hp / self.max_hp), (x, y))
 
-        pygame.draw.rect(surface, (60,60,60), (x, y, bar_width, bar_height))
-        pygame.draw.rect(surface, (0,220,0), (x, y, fill_width, bar_height))
-        pygame.draw.rect(surface, (0,0,0), (x, y, bar_width, bar_height), 1)
+### --- COLLISION LAYERS --- ###
+# one bit per kind of body - a pair is only ever tested if each one's mask has the other's layer in it
+COLLIDE_PLAYER = 1 << 0
+COLLIDE_ENEMY = 1 << 1
+COLLIDE_ROCK = 1 << 2
+COLLIDE_PLAYER_LASER = 1 << 3
+COLLIDE_ENEMY_LASER = 1 << 4
+COLLIDE_SCRAP = 1 << 5
 
 ### --- GAMEOBJECT --- ###
+# every entity class declares __slots__, so none of them carry an instance dict - see memory_report()
 class GameObject:
-    def __init__(self, pos, vel, mass, img_path, scale=1.0, facing=0, spin_speed=0, max_hp=100, hp_visible=False):
-        self.phys = Physics(pos, vel, mass=mass, facing=facing, spin_speed=spin_speed)
-        self.graphics = Graphics(img_path, scale)
-        self.health = Health(max_hp, hp_visible)
-
+    __slots__ = ("phys", "graphics", "health", "net_id")
+    layer = LAYER_ROCKS
+    # objects that don't declare a collision layer never collide with anything
+    collision_layer = 0
+    collision_mask = 0
+
+    # world is the simulation's physics world if it has one (see PHYSICS_WORLD), otherwise the body moves itself
+    def __init__(self, pos, vel, mass, img_path, scale=1.0, facing=0, spin_speed=0, max_hp=100, hp_visible=False, world=None):
+        if world is None:
+            self.phys = Physics(pos, vel, mass=mass, facing=facing, spin_speed=spin_speed)
+        else:
+            self.phys = WorldBody(pos, vel, mass=mass, facing=facing, spin_speed=spin_speed, world=world)
+        # objects without an image or hit points (lasers) don't get those components at all
+        self.graphics = Graphics(img_path, scale) if img_path else None
+        self.health = Health(max_hp, hp_visible) if max_hp is not None else None
+        self.phys.wrap_radius = self.graphics.get_radius() if self.graphics else None
+        # handed out by net.py the first time it sends this object, and cleared whenever a pooled one comes back
+        self.net_id = None
+
+    # puts the existing components back to a freshly constructed state, for objects coming out of a pool
+    def reset_components(self, pos, vel, mass, img_path, scale=1.0, facing=0, spin_speed=0, max_hp=100, hp_visible=False):
+        self.phys.reset(pos, vel, mass=mass, facing=facing, spin_speed=spin_speed)
+        if self.graphics:
+            self.graphics.reset(img_path, scale)
+        if self.health:
+            self.health.reset(max_hp, hp_visible)
+        self.phys.wrap_radius = self.graphics.get_radius() if self.graphics else None
+        self.net_id = None
+
+    # with the physics world on, the simulation moves every body in one go after all the updates instead
     def update(self):
+        if self.phys.batched:
+            return
         self.phys.move()
-        if self.graphics.img:
-            self.phys.wrap_position(self.graphics.get_radius())
-
-    def draw(self, surface):
-        self.graphics.draw(surface, self.phys.pos, self.phys.facing)
+        if self.phys.wrap_radius is not None:
+            self.phys.wrap_position(self.phys.wrap_radius)
+        self.phys.apply_limits()
+
+    # alpha is how far we are between the previous tick and the current one
+    def draw(self, queue: "RenderQueue", alpha=1.0):
+        pos = self.phys.draw_pos(alpha)
+        self.graphics.draw(queue, self.layer, pos, self.phys.draw_facing(alpha))
         if self.health.is_visible:
-            self.health.draw_bar(surface, self)
+            self.health.draw_bar(queue, self, pos)
 
     def get_radius(self):
         return self.graphics.get_radius()
@@ -145,28 +1121,39 @@ class GameObject:
         return self.phys.collides_with(other.phys, self.get_radius(), other.get_radius())
 
     def take_damage(self, amount):
+        if not self.health:
+            return
         self.health.hp -= amount
         if self.health.hp < 0:
             self.health.hp = 0
 
     def is_dead(self):
-        return self.health.hp <= 0
+        return self.health is not None and self.health.hp <= 0
+
+    # 0 for anything without a health component, which is what snapshots and the state hash store for it
+    def hp(self):
+        return self.health.hp if self.health else 0.0
 
 ### --- ROCK / ASTEROID --- ###
 class Rock(GameObject):
-    def __init__(self, pos):
-        angle = random.uniform(0, 360)
-        speed = random.uniform(1, 2.5)
+    layer = LAYER_ROCKS
+    collision_layer = COLLIDE_ROCK
+    collision_mask = COLLIDE_PLAYER | COLLIDE_ENEMY | COLLIDE_ROCK | COLLIDE_PLAYER_LASER | COLLIDE_ENEMY_LASER | COLLIDE_SCRAP
+    __slots__ = ("is_breaking", "break_timer")
+    break_duration = 20
+
+    def __init__(self, pos, rng: "GameRandom", world=None):
+        angle = rng.rocks.uniform(0, 360)
+        speed = rng.rocks.uniform(1, 2.5)
         dir = pygame.Vector2(1, 0).rotate(angle) * speed
-        mass = random.uniform(0.5, 1.5)
-        spin_speed = random.uniform(-2, 2)
-        super().__init__(pos, vel=dir, mass=mass, img_path="asteroid.png", scale=mass, facing=angle, spin_speed=spin_speed)
+        mass = rng.rocks.uniform(0.5, 1.5)
+        spin_speed = rng.rocks.uniform(-2, 2)
+        super().__init__(pos, vel=dir, mass=mass, img_path="asteroid.png", scale=mass, facing=angle, spin_speed=spin_speed, world=world)
         self.health.max_hp = mass*50
         self.health.hp = mass*50
 
         self.is_breaking = False
         self.break_timer = 0
-        self.break_duration = 20
 
     def update(self):
         if self.is_breaking:
@@ -174,13 +1161,15 @@ class Rock(GameObject):
             self.graphics.scale *= 0.9
         else:
             super().update()
-            self.phys.facing = (self.phys.facing + self.phys.spin_speed) % 360
+            # the physics world spins batched rocks itself
+            if not self.phys.batched:
+                self.phys.facing = (self.phys.facing + self.phys.spin_speed) % 360
 
-    def draw(self, surface):
+    def draw(self, queue: "RenderQueue", alpha=1.0):
         if self.is_breaking:
-            self.graphics.draw(surface, self.phys.pos, self.phys.facing)
+            self.graphics.draw(queue, self.layer, self.phys.pos, self.phys.facing)
         else:
-            super().draw(surface)
+            super().draw(queue, alpha)
 
     def is_dead(self):
         return self.is_breaking and self.break_timer >= self.break_duration
@@ -189,66 +1178,205 @@ class Rock(GameObject):
         self.is_breaking = True
         self.break_timer = 0
 
+    # an empty rock for a snapshot or a waking sector to fill in, without touching the rng
     @classmethod
-    def spawn_random(cls, rocks: list):
-        edge = random.choice(['top', 'bottom', 'left', 'right'])
+    def blank(cls, world=None):
+        rock = cls.__new__(cls)
+        GameObject.__init__(rock, (0, 0), None, 1, "asteroid.png", world=world)
+        rock.is_breaking = False
+        rock.break_timer = 0
+        return rock
+
+    # just outside the window, which has its top left at origin in the world
+    @classmethod
+    def spawn_random(cls, sim: "Simulation", origin=(0, 0)):
+        rng = sim.rng
+        edge = rng.rocks.choice(['top', 'bottom', 'left', 'right'])
         if edge == 'top':
-            pos = (random.randint(0, 1280), -40)
+            pos = (rng.rocks.randint(0, 1280), -40)
         elif edge == 'bottom':
-            pos = (random.randint(0, 1280), 760)
+            pos = (rng.rocks.randint(0, 1280), 760)
         elif edge == 'left':
-            pos = (-40, random.randint(0, 720))
+            pos = (-40, rng.rocks.randint(0, 720))
         else:
-            pos = (1320, random.randint(0, 720))
-        rocks.append(cls(pos))
-
-### --- DEBRIS --- ###
-class Debris(GameObject):
-    def __init__(self, pos, colour=(180,180,180)):
-        angle = random.uniform(0,360)
-        speed = random.uniform(2,6)
-        vel = pygame.Vector2(1,0).rotate(angle) * speed
-        super().__init__(pos, vel=vel, mass=0.01, img_path=None, scale=1.0)
-        self.lifetime = random.randint(15,30)
-        self.age = 0
-        self.colour = colour
-        self.radius = random.randint(2,6)
+            pos = (1320, rng.rocks.randint(0, 720))
+        sim.rocks.append(cls((origin[0] + pos[0], origin[1] + pos[1]), rng, sim.physics_world))
+
+### --- PARTICLES --- ###
+# debris flecks live in flat numpy arrays and get integrated in one go, instead of being a GameObject each.
+# they are drawn from pre-rendered circle stamps, one per (colour, radius, alpha level)
+class ParticleSystem:
+    MIN_RADIUS = 2
+    MAX_RADIUS = 6
+    ALPHA_LEVELS = 16
+
+    # a simulation's debris draws from its particles stream, anything else gets a generator of its own
+    def __init__(self, capacity=1024, rng=None):
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.count = 0
+        self.pos = np.zeros((capacity, 2), dtype=np.float32)
+        self.vel = np.zeros((capacity, 2), dtype=np.float32)
+        self.age = np.zeros(capacity, dtype=np.int32)
+        self.lifetime = np.ones(capacity, dtype=np.int32)
+        self.radius = np.zeros(capacity, dtype=np.int32)
+        self.colour = np.zeros(capacity, dtype=np.int32)    # index into self.palette
+
+        self.palette = {}
+        self.stamps = []    # flat lookup table, see stamp_index()
+        # fraction of each burst that actually gets emitted, lowered by the frame governor
+        self.density = 1.0
+
+    def __len__(self):
+        return self.count
+
+    def _arrays(self):
+        return (self.pos, self.vel, self.age, self.lifetime, self.radius, self.colour)
+
+    def _reserve(self, needed):
+        capacity = len(self.age)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ("pos", "vel", "age", "lifetime", "radius", "colour"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def _colour_index(self, colour):
+        colour = tuple(colour)
+        index = self.palette.get(colour)
+        if index is None:
+            index = len(self.palette)
+            self.palette[colour] = index
+        return index
+
+    # stamps are only rendered once something actually draws, so headless runs never touch a surface
+    def _render_stamps(self):
+        per_colour = (self.MAX_RADIUS - self.MIN_RADIUS + 1) * self.ALPHA_LEVELS
+        for colour in list(self.palette)[len(self.stamps) // per_colour:]:
+            self._render_colour(colour)
+
+    def _render_colour(self, colour):
+        for radius in range(self.MIN_RADIUS, self.MAX_RADIUS + 1):
+            for level in range(self.ALPHA_LEVELS):
+                alpha = round(255 * level / (self.ALPHA_LEVELS - 1))
+                stamp = pygame.Surface((radius*2, radius*2), pygame.SRCALPHA)
+                pygame.draw.circle(stamp, (*colour, alpha), (radius, radius), radius)
+                self.stamps.append(stamp)
+
+    def stamp_index(self, colour, radius, level):
+        radii = self.MAX_RADIUS - self.MIN_RADIUS + 1
+        return (colour * radii + (radius - self.MIN_RADIUS)) * self.ALPHA_LEVELS + level
+
+    # flecks fly out at 2-6 px/tick in any direction, 15-30 ticks, 2-6 px radius
+    def emit(self, pos, count, colour=(180,180,180)):
+        count = int(count * self.density)
+        if count <= 0:
+            return
+        start = self.count
+        end = start + count
+        self._reserve(end)
+
+        angle = np.radians(self.rng.uniform(0, 360, count))
+        speed = self.rng.uniform(2, 6, count)
+        self.pos[start:end] = (pos[0], pos[1])
+        self.vel[start:end, 0] = np.cos(angle) * speed
+        self.vel[start:end, 1] = np.sin(angle) * speed
+        self.age[start:end] = 0
+        self.lifetime[start:end] = self.rng.integers(15, 31, count)
+        self.radius[start:end] = self.rng.integers(self.MIN_RADIUS, self.MAX_RADIUS + 1, count)
+        self.colour[start:end] = self._colour_index(colour)
+        self.count = end
 
     def update(self):
-        super().update()
-        self.age+=1
-
-    def draw(self,surface):
-        alpha = max(0, 255 - int(255 * (self.age / self.lifetime)))
-        debris_colour = (*self.colour, alpha)
-        s = pygame.Surface((self.radius*2, self.radius*2), pygame.SRCALPHA)
-        pygame.draw.circle(s, debris_colour, (self.radius, self.radius), self.radius)
-        surface.blit(s, (self.phys.pos.x - self.radius, self.phys.pos.y - self.radius))
-
-    def is_expired(self):
-        return self.age >= self.lifetime
-    
-    def get_radius(self):
-        return self.radius
+        n = self.count
+        if n == 0:
+            return
+        self.pos[:n] += self.vel[:n]
+        self.age[:n] += 1
+
+        alive = self.age[:n] < self.lifetime[:n]
+        if not alive.all():
+            keep = np.flatnonzero(alive)
+            for arr in self._arrays():
+                arr[:len(keep)] = arr[keep]
+            self.count = len(keep)
+
+    def clear(self):
+        self.count = 0
+
+    # fade out linearly over the particle lifetime
+    def alpha_levels(self):
+        n = self.count
+        alpha = np.maximum(0, 255 - (255 * self.age[:n]) // self.lifetime[:n])
+        return (alpha * (self.ALPHA_LEVELS - 1) + 127) // 255
+
+    # particles move in straight lines, so stepping back along the velocity is the same as interpolating
+    def draw(self, queue: "RenderQueue", alpha=1.0, layer=LAYER_DEBRIS):
+        n = self.count
+        if n == 0:
+            return
+        self._render_stamps()
+        radius = self.radius[:n]
+        pos = self.pos[:n] if alpha >= 1 else self.pos[:n] - self.vel[:n] * (1 - alpha)
+        topleft = (pos - radius[:, None] - queue.origin).astype(np.int32)
+        size = radius * 2
+        on_screen = ((topleft[:, 0] < queue.width) & (topleft[:, 1] < queue.height)
+                     & (topleft[:, 0] + size > 0) & (topleft[:, 1] + size > 0))
+        queue.culled += n - int(on_screen.sum())
+
+        index = self.stamp_index(self.colour[:n], radius, self.alpha_levels())[on_screen]
+        stamps = self.stamps
+        queue.extend(layer, [(stamps[i], xy) for i, xy in zip(index.tolist(), topleft[on_screen].tolist())])
 
 ### --- LASER --- ###
 class Laser(GameObject):
-    def __init__(self, pos, angle, owner="player", colour=None):
+    layer = LAYER_LASERS
+    # the layer and mask depend on the owner, so they're per laser
+    __slots__ = ("dir", "distance_travelled", "owner", "colour", "collision_layer", "collision_mask")
+    images = {}
+    range = 500
+    damage = 20
+    speed = 20
+
+    def __init__(self, pos, angle, owner="player", colour=None, world=None):
+        super().__init__(pos, vel=None, mass=0.005, img_path=None, max_hp=None, world=world)
+        self.reset(pos, angle, owner, colour)
+
+    def reset(self, pos, angle, owner="player", colour=None):
         dir = pygame.Vector2(1, 0).rotate(angle)
-        super().__init__(pos, vel=dir * 20, mass=0.005, img_path=None, scale=1.0, facing=angle)
+        self.reset_components(pos, vel=dir * self.speed, mass=0.005, img_path=None, scale=1.0, facing=angle, max_hp=None)
         self.dir = dir
-        self.range = 500
         self.distance_travelled = 0
-        self.damage = 20
-        self.owner = owner
+        self.set_owner(owner)
         self.colour = colour if colour else ((80,220,255) if owner == "player" else (255,60,60))
 
+    # a laser passes straight through whoever fired it and anything on their side
+    def set_owner(self, owner):
+        self.owner = owner
+        if owner == "player":
+            self.collision_layer = COLLIDE_PLAYER_LASER
+            self.collision_mask = COLLIDE_ENEMY | COLLIDE_ROCK
+        else:
+            self.collision_layer = COLLIDE_ENEMY_LASER
+            self.collision_mask = COLLIDE_PLAYER | COLLIDE_ROCK
+
     def update(self):
         super().update()
         self.distance_travelled += self.phys.vel.length()
 
-    def draw(self, surface):
-        pygame.draw.line(surface, self.colour, self.phys.pos, self.phys.pos + self.dir * 20, 5)
+    # the beam is a 20x5 bar pointing along +x, rotated through the sprite cache like everything else
+    def draw(self, queue: "RenderQueue", alpha=1.0):
+        img = self.images.get(self.colour)
+        if img is None:
+            img = pygame.Surface((20, 5), pygame.SRCALPHA)
+            img.fill(self.colour)
+            self.images[self.colour] = img
+        sprite = sprite_cache.get(("laser", self.colour), img, self.phys.facing, 1.0)
+        rect = sprite.get_rect(center=self.phys.draw_pos(alpha) + self.dir * 10)
+        queue.submit(self.layer, sprite, rect.topleft)
 
     def is_expired(self):
         return self.distance_travelled >= self.range
@@ -259,27 +1387,78 @@ class Laser(GameObject):
     def get_radius(self):
         return 5
 
+### --- INPUT --- ###
+# one tick's worth of player controls - the simulation only ever sees these, never the keyboard
+class Inputs:
+    def __init__(self, left=False, right=False, forward=False, back=False, strafe_left=False, strafe_right=False, fire=False):
+        self.left = left
+        self.right = right
+        self.forward = forward
+        self.back = back
+        self.strafe_left = strafe_left
+        self.strafe_right = strafe_right
+        self.fire = fire
+
+    def __repr__(self):
+        held = [name for name, value in vars(self).items() if value]
+        return f"Inputs({', '.join(held)})"
+
+    FIELDS = ("left", "right", "forward", "back", "strafe_left", "strafe_right", "fire")
+
+    # one bit per control, for input logs
+    def to_bits(self):
+        bits = 0
+        for i, name in enumerate(self.FIELDS):
+            if getattr(self, name):
+                bits |= 1 << i
+        return bits
+
+    @classmethod
+    def from_bits(cls, bits):
+        return cls(**{name: bool(bits >> i & 1) for i, name in enumerate(cls.FIELDS)})
+
+    @classmethod
+    def from_keys(cls, keys, fire=False):
+        return cls(
+            left=keys[pygame.K_LEFT] or keys[pygame.K_a],
+            right=keys[pygame.K_RIGHT] or keys[pygame.K_d],
+            forward=keys[pygame.K_w],
+            back=keys[pygame.K_s],
+            strafe_left=keys[pygame.K_q],
+            strafe_right=keys[pygame.K_e],
+            fire=fire,
+        )
+
 ### --- PLAYER --- ###
 class Player(GameObject):
-    def __init__(self):
-        super().__init__((640,360), vel=(0,0), mass=2, img_path="spaceship.png", scale=1.0, facing=-90)
+    layer = LAYER_PLAYER
+    collision_layer = COLLIDE_PLAYER
+    collision_mask = COLLIDE_ENEMY | COLLIDE_ROCK | COLLIDE_ENEMY_LASER | COLLIDE_SCRAP
+    __slots__ = ("max_speed", "thrust", "turn_vel", "turn_friction", "max_turn_speed", "inputs")
+
+    def __init__(self, world=None):
+        super().__init__((WORLD_WIDTH // 2, WORLD_HEIGHT // 2), vel=(0,0), mass=2, img_path="spaceship.png", scale=1.0, facing=-90,
+                         world=world)
         self.health.is_visible = True
         self.max_speed = 5
         self.thrust = 0.18
         self.turn_vel = 0
         self.turn_friction = 0.85
         self.max_turn_speed = 6
-        self.graphics.img = pygame.transform.scale(self.graphics.img, (80,80))
-
-    def update(self):
-        # every frame, check which keys are pressed
-        keys = pygame.key.get_pressed()
-
+        self.graphics.set_image(pygame.transform.scale(self.graphics.img, (80,80)), "spaceship.png@80x80")
+        self.phys.wrap_radius = self.graphics.get_radius()
+        self.phys.clamp = True
+        self.phys.damping = 0.99
+        self.phys.max_speed = self.max_speed
+        # what a ship added with Simulation.add_player does next tick - the first player's come in through step()
+        self.inputs = Inputs()
+
+    def update(self, inputs: "Inputs"):
         # turning logic
         TURN_ACC = 0.6
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+        if inputs.left:
             self.turn_vel -= TURN_ACC
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+        if inputs.right:
             self.turn_vel += TURN_ACC
 
         self.turn_vel *= self.turn_friction
@@ -293,57 +1472,85 @@ class Player(GameObject):
         dir = pygame.Vector2(1, 0).rotate(self.phys.facing)
         side = dir.rotate(90)
         self.phys.acc = pygame.Vector2(0, 0)
-        if keys[pygame.K_w]:
+        if inputs.forward:
             self.phys.acc += dir * self.thrust        
-        if keys[pygame.K_s]:
+        if inputs.back:
             self.phys.acc -= dir * self.thrust
-        if keys[pygame.K_q]:
+        if inputs.strafe_left:
             self.phys.acc -= side * self.thrust
-        if keys[pygame.K_e]:
+        if inputs.strafe_right:
             self.phys.acc += side * self.thrust
 
+        # stays inside the window, friction and the speed cap are physics limits
         super().update()
 
-        # clamp position to window
-        self.phys.pos.x = max(0, min(1280, self.phys.pos.x))
-        self.phys.pos.y = max(0, min(720, self.phys.pos.y))
-
-        friction = 0.99
-        self.phys.vel *= friction
-
-        if self.phys.vel.length() > self.max_speed:
-            self.phys.vel.scale_to_length(self.max_speed)
-
 ### --- ENEMY --- ###
 class Enemy(GameObject):
-    def __init__(self, pos):
-        facing = random.uniform(0,360)
-        super().__init__(pos, vel=(0,0), mass=1.8, img_path="enemyship.png", scale=0.9, facing=facing, max_hp=80, hp_visible=True)
+    layer = LAYER_ENEMIES
+    collision_layer = COLLIDE_ENEMY
+    collision_mask = COLLIDE_PLAYER | COLLIDE_ENEMY | COLLIDE_ROCK | COLLIDE_PLAYER_LASER | COLLIDE_SCRAP
+    __slots__ = ("max_speed", "thrust", "turn_vel", "max_turn_speed", "accuracy", "aggression", "bravery", "preferred_range",
+                 "fire_range", "fire_cooldown_base", "fire_cooldown", "state", "wander_timer", "wander_dir", "player_dist",
+                 "desired_angle", "move", "can_fire", "separation", "next_think", "think_slot", "strafe_dir", "_game")
+    turn_friction = 0.7
+    vision_range = 900
+
+    # enemies belong to one simulation - its rng rolls their stats, its params set the ranges, and they fire into it
+    def __init__(self, pos, game: "Simulation", world=None):
+        super().__init__(pos, vel=(0,0), mass=1.8, img_path="enemyship.png", scale=0.9, max_hp=80, hp_visible=True, world=world)
+        self.reset(pos, game)
+
+    def reset(self, pos, game: "Simulation"):
+        self._game = game
+        rng = game.rng
+        params = game.params
+        facing = rng.enemies.uniform(0,360)
+        self.reset_components(pos, vel=(0,0), mass=1.8, img_path="enemyship.png", scale=0.9, facing=facing, max_hp=80, hp_visible=True)
 
         # movement
-        self.max_speed = random.uniform(2.0, 3.5)
-        self.thrust = random.uniform(0.07, 0.10)
+        self.max_speed = rng.enemies.uniform(2.0, 3.5)
+        self.phys.clamp = True
+        self.phys.damping = 0.992
+        self.phys.max_speed = self.max_speed
+        self.thrust = rng.enemies.uniform(0.07, 0.10)
         self.turn_vel = 0
-        self.turn_friction = 0.7
-        self.max_turn_speed = random.uniform(2.0, 4.0)
+        self.max_turn_speed = rng.enemies.uniform(2.0, 4.0)
         
         # behaviour
-        self.accuracy = random.uniform(0.2, 0.4)
-        self.aggression = random.uniform(0.4, 0.9)
-        self.bravery = random.uniform(0.3, 0.9)
-        self.preferred_range = random.uniform(220, 420)
-        self.vision_range = 900
-        self.fire_range = random.uniform(280, 520)
-        self.fire_cooldown_base = random.randint(28, 64)
+        self.accuracy = rng.enemies.uniform(*params["accuracy"])
+        self.aggression = rng.enemies.uniform(*params["aggression"])
+        self.bravery = rng.enemies.uniform(*params["bravery"])
+        self.preferred_range = rng.enemies.uniform(*params["preferred_range"])
+        self.fire_range = rng.enemies.uniform(*params["fire_range"])
+        self.fire_cooldown_base = rng.enemies.randint(28, 64)
         self.fire_cooldown = 0
         self.state = "wander"
 
         self.wander_timer = 0
         self.wander_dir = 0
+
+        # current plan, see think()
+        self.player_dist = float("inf")
+        self.desired_angle = facing
+        self.move = "approach"
+        self.can_fire = False
+        self.separation = pygame.Vector2(0,0)
+
+        # new enemies think straight away, the slot staggers them across the AI scheduler's intervals
+        self.next_think = 0
+        self.think_slot = game.enemies_spawned
+        game.enemies_spawned += 1
+
+        # which way this one circles the player
+        self.strafe_dir = rng.enemies.choice((-1, 1))
     
-    def update(self, player: "Player", rocks: list["Rock"], others: list["Enemy"]):
-        to_player = player.phys.pos - self.phys.pos
-        dist = to_player.length()
+    # decision making - picks a state, a heading to turn towards, how to thrust and whether shooting is allowed.
+    # the AI scheduler decides how often this runs, act() keeps flying on the last plan in between.
+    # steer is this enemy's row from Enemy.steer_all
+    @profiler.timed("Enemy.think")
+    def think(self, steer):
+        to_x, to_y, dist, attack_angle, flee_angle, sep_x, sep_y = steer
+        self.player_dist = dist
 
         low_hp = self.health.hp < (self.health.max_hp * (0.35 * (1 - self.bravery) + 0.15))
         if low_hp and dist < 600:
@@ -353,7 +1560,34 @@ class Enemy(GameObject):
         else:
             self.state = "wander"
 
-        self.phys.acc = pygame.Vector2(0,0)
+        if self.state == "wander":
+            self.wander_timer -= 1
+            if self.wander_timer <= 0:
+                self.wander_timer = self.game.rng.enemies.randint(15, 45)
+                self.wander_dir = self.game.rng.enemies.uniform(-0.9, 0.9)
+
+        if self.state == "attack":
+            self.desired_angle = attack_angle
+
+            # Move logic: approach if too far, back off if too close, strafe around preferred range
+            if dist > self.preferred_range * 1.2:
+                self.move = "approach"
+            elif dist < self.preferred_range * 0.85:
+                self.move = "retreat"
+            else:
+                self.move = "strafe"
+            self.can_fire = dist < self.fire_range
+
+        # Flee behavior: face away and burn
+        if self.state == "flee":
+            self.desired_angle = flee_angle
+
+        self.separation = pygame.Vector2(sep_x, sep_y)
+
+    # runs every tick - turning, thrust, shooting and integration from the current plan
+    @profiler.timed("Enemy.act")
+    def act(self):
+        acc = pygame.Vector2(0,0)
         forward = pygame.Vector2(1,0).rotate(self.phys.facing)
         right = forward.rotate(90)
 
@@ -365,110 +1599,127 @@ class Enemy(GameObject):
                 self.turn_vel = self.max_turn_speed * (1 if self.turn_vel > 0 else -1)
             self.phys.facing = (self.phys.facing + self.turn_vel) % 360
             return diff
-        
-        def separation():
-            force = pygame.Vector2(0,0)
-            for obs in rocks + [o for o in others if o is not self]:
-                away = self.phys.pos - obs.phys.pos
-                d = away.length()
-                if d > 1 and d < 140:
-                    away.scale_to_length(min(2.5, 140.0 / d))
-                    force += away
-            return force
-        
+
         if self.state == "wander":
-            self.wander_timer -= 1
-            if self.wander_timer <= 0:
-                self.wanter_timer = random.randint(15, 45)
-                self.wander_dir = random.uniform(-0.9, 0.9)
             self.turn_vel += 0.2 * self.wander_dir
             self.turn_vel *= self.turn_friction
             self.phys.facing = (self.phys.facing + self.turn_vel) % 360
-            self.phys.acc += forward * (self.thrust * 0.6)
+            acc += forward * (self.thrust * 0.6)
 
         if self.state == "attack":
-            desired_angle = pygame.Vector2(1, 0).angle_to(to_player)
-            angle_error = turn_towards(desired_angle)
-
-            # Move logic: approach if too far, back off if too close, strafe around preferred range
-            near = dist < self.preferred_range * 0.85
-            far = dist > self.preferred_range * 1.2
+            angle_error = turn_towards(self.desired_angle)
 
-            if far:
-                self.phys.acc += forward * (self.thrust * (0.8 + 0.4 * self.aggression))
-            elif near:
-                self.phys.acc -= forward * (self.thrust * (0.6 + 0.4 * (1 - self.aggression)))
+            if self.move == "approach":
+                acc += forward * (self.thrust * (0.8 + 0.4 * self.aggression))
+            elif self.move == "retreat":
+                acc -= forward * (self.thrust * (0.6 + 0.4 * (1 - self.aggression)))
             else:
                 # Strafe with a slight bias so they circle
-                strafe_dir = 1 if (hash(id(self)) & 1) else -1
-                self.phys.acc += right * (self.thrust * 0.9 * strafe_dir)
+                acc += right * (self.thrust * 0.9 * self.strafe_dir)
 
             # Add a touch of noise so they don't lock perfectly
-            self.phys.acc += pygame.Vector2(random.uniform(-0.06, 0.06), random.uniform(-0.06, 0.06))
+            acc += pygame.Vector2(self.game.rng.enemies.uniform(-0.06, 0.06), self.game.rng.enemies.uniform(-0.06, 0.06))
 
             # Shooting
             self.fire_cooldown = max(0, self.fire_cooldown - 1)
-            if dist < self.fire_range and self.fire_cooldown == 0:
+            if self.can_fire and self.fire_cooldown == 0:
                 # gate by aim error (convert accuracy to allowed degrees)
                 allowed_error = (1.0 - self.accuracy) * 40 + 4  # 4..44 deg
                 if abs(angle_error) < allowed_error:
                     # add aim spread
-                    spread = random.uniform(-allowed_error * 0.5, allowed_error * 0.5)
+                    spread = self.game.rng.enemies.uniform(-allowed_error * 0.5, allowed_error * 0.5)
                     shot_angle = (self.phys.facing + spread) % 360
                     self._shoot(shot_angle)
                     # randomized cooldown
-                    jitter = random.randint(-6, 12)
+                    jitter = self.game.rng.enemies.randint(-6, 12)
                     self.fire_cooldown = max(8, self.fire_cooldown_base + jitter)
 
-        # Flee behavior: face away and burn
         if self.state == "flee":
-            desired_angle = (pygame.Vector2(1, 0).angle_to(-to_player)) % 360
-            turn_towards(desired_angle, turn_acc=0.7)
-            self.phys.acc += forward * (self.thrust * 1.2)
+            turn_towards(self.desired_angle, turn_acc=0.7)
+            acc += forward * (self.thrust * 1.2)
 
         # Avoid obstacles/others
-        self.phys.acc += separation() * 0.06
+        acc += self.separation * 0.06
+        self.phys.acc = acc
 
-        # Integrate and clamp similar to player
+        # Integrate, clamp, dampen velocity and clamp speed, same as the player
         super().update()
-        self.phys.pos.x = max(0, min(1280, self.phys.pos.x))
-        self.phys.pos.y = max(0, min(720, self.phys.pos.y))
 
-        # Dampen velocity and clamp speed
-        self.phys.vel *= 0.992
-        if self.phys.vel.length() > self.max_speed:
-            self.phys.vel.scale_to_length(self.max_speed)
+    def update(self, steer):
+        self.think(steer)
+        self.act()
+
+    # pursuit/flee headings and separation in one numpy pass, for the thinkers (every enemy by default).
+    # each one goes after whichever player is nearest. separation pushes away from every rock and other enemy
+    # within 140px, harder the closer they are
+    @staticmethod
+    def steer_all(players: list["Player"], rocks: list["Rock"], enemies: list["Enemy"], index: "NeighborIndex", thinkers=None):
+        thinkers = enemies if thinkers is None else thinkers
+        if not thinkers:
+            return []
+        enemy_pos = body_positions(enemies)
+        rock_pos = body_positions(rocks)
+        thinker_pos = enemy_pos if thinkers is enemies else body_positions(thinkers)
+
+        index.build(np.concatenate((rock_pos, enemy_pos)))
+        qi, _, away, d = index.query(thinker_pos, 140)
+        near = d > 1
+        qi, away, d = qi[near], away[near], d[near]
+        separation = np.zeros_like(thinker_pos)
+        np.add.at(separation, qi, away * (np.minimum(2.5, 140.0 / d) / d)[:, None])
+
+        offsets = body_positions(players)[None, :, :] - thinker_pos[:, None, :]
+        nearest = np.argmin((offsets ** 2).sum(axis=2), axis=1)
+        to_player = offsets[np.arange(len(thinker_pos)), nearest]
+        dist = np.hypot(to_player[:, 0], to_player[:, 1])
+        attack_angle = np.degrees(np.arctan2(to_player[:, 1], to_player[:, 0]))
+        flee_angle = np.degrees(np.arctan2(-to_player[:, 1], -to_player[:, 0])) % 360
+
+        return np.column_stack((to_player, dist, attack_angle, flee_angle, separation)).tolist()
 
     def _shoot(self, angle):
         # enemy laser is a different colour
-        self.game.lasers.append(Laser(self.phys.pos, angle, owner="enemy", colour=(255,60,60)))
+        self.game.lasers.append(self.game.laser_pool.acquire(self.phys.pos, angle, owner="enemy", colour=(255,60,60)))
 
     # give access to GameCtrl at runtime
     @property
-    def game(self) -> "GameCtrl":
+    def game(self) -> "Simulation":
         return self._game
 
     @game.setter
-    def game(self, g: "GameCtrl"):
+    def game(self, g: "Simulation"):
         self._game = g
 
     @classmethod
-    def spawn_random(cls):
-        edge = random.choice(['top', 'bottom', 'left', 'right'])
+    def spawn_random(cls, sim: "Simulation", origin=(0, 0)):
+        rng = sim.rng
+        edge = rng.enemies.choice(['top', 'bottom', 'left', 'right'])
         if edge == 'top':
-            pos = (random.randint(40, 1240), -30)
+            pos = (rng.enemies.randint(40, 1240), -30)
         elif edge == 'bottom':
-            pos = (random.randint(40, 1240), 750)
+            pos = (rng.enemies.randint(40, 1240), 750)
         elif edge == 'left':
-            pos = (-30, random.randint(40, 680))
+            pos = (-30, rng.enemies.randint(40, 680))
         else:
-            pos = (1310, random.randint(40, 680))
-        return cls(pos)
+            pos = (1310, rng.enemies.randint(40, 680))
+        pos = (origin[0] + pos[0], origin[1] + pos[1])
+        return sim.enemy_pool.acquire(pos, sim)
 
 ### --- SCRAP --- ###
 class Scrap(GameObject):
-    def __init__(self, pos, vel, point_value=1, timer=10):
-        super().__init__(pos, vel, mass=0.1, img_path="coin.png")
+    layer = LAYER_SCRAP
+    collision_layer = COLLIDE_SCRAP
+    collision_mask = COLLIDE_PLAYER | COLLIDE_ENEMY | COLLIDE_ROCK | COLLIDE_SCRAP
+    __slots__ = ("point_value", "timer", "age")
+
+    def __init__(self, pos, vel, point_value=1, timer=10, world=None):
+        super().__init__(pos, vel, mass=0.1, img_path="coin.png", world=world)
+        self.reset(pos, vel, point_value, timer)
+
+    def reset(self, pos, vel, point_value=1, timer=10):
+        self.reset_components(pos, vel, mass=0.1, img_path="coin.png")
+        self.phys.damping = 0.98
+        self.phys.stop_speed = 0.1
         self.point_value = point_value
         self.timer = timer
         self.age = 0
@@ -477,81 +1728,387 @@ class Scrap(GameObject):
 
     def update(self):
         super().update()
-        friction = 0.98
-        if self.phys.vel.length() > 0.1:
-            self.phys.vel *= friction
-        else:
-            self.phys.vel = pygame.math.Vector2(0,0)
-        
         self.age += 1
 
     def is_expired(self):
-        return self.age >= self.timer * 60
+        return self.age >= self.timer * SIM_HZ
     
     def get_radius(self):
         return 12 # <<< placeholder value
 
+### --- OBJECT POOLS --- ###
+# keeps dead objects around so new ones can be re-initialised in place with reset(*args) instead of constructed.
+# new objects are made in the pool's physics world, and a released one gives its row back until it's reused
+class ObjectPool:
+    def __init__(self, cls, world=None):
+        self.cls = cls
+        self.world = world
+        self.free = []
+        self.live = 0
+        self.high_water = 0
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, *args, **kwargs):
+        if self.free:
+            obj = self.free.pop()
+            obj.reset(*args, **kwargs)
+            self.reused += 1
+        else:
+            obj = self.cls(*args, world=self.world, **kwargs)
+            self.created += 1
+        self.live += 1
+        if self.live > self.high_water:
+            self.high_water = self.live
+        return obj
+
+    def release(self, obj):
+        obj.phys.release()
+        self.live -= 1
+        self.free.append(obj)
+
+    def stats(self):
+        return {"live": self.live, "free": len(self.free), "high_water": self.high_water, "created": self.created, "reused": self.reused}
+
+# drops everything is_dead() picks out of the list in place, keeping the order, and hands it back to the pool -
+# or without one, lets go of its physics row unless release is off
+def compact(objects: list, is_dead, pool: ObjectPool = None, release=True):
+    write = 0
+    for obj in objects:
+        if is_dead(obj):
+            if pool:
+                pool.release(obj)
+            elif release:
+                obj.phys.release()
+        else:
+            objects[write] = obj
+            write += 1
+    del objects[write:]
+
+### --- MEMORY --- ###
+# what the entities cost, per type. an entity's size is the object, its components and the vectors and floats they
+# hold - images, class attributes and references to the rest of the game are shared, so they don't count. every float
+# is counted as its own object, so this errs high. a batched body's row in the physics world counts as well
+MEMORY_SAMPLE = 64
+
+def _owned_bytes(obj):
+    size = sys.getsizeof(obj)
+    values = [getattr(obj, name, None) for cls in type(obj).__mro__ for name in cls.__dict__.get("__slots__", ())]
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+        values.extend(obj.__dict__.values())
+    return size + sum(sys.getsizeof(value) for value in values if isinstance(value, (float, pygame.Vector2)))
+
+def entity_bytes(obj: "GameObject"):
+    size = _owned_bytes(obj)
+    if obj.phys.batched:
+        # the vector properties hand out fresh copies, so only the handle and its row count
+        size += sys.getsizeof(obj.phys) + obj.phys.world.row_bytes()
+    else:
+        size += _owned_bytes(obj.phys)
+    for part in (obj.graphics, obj.health):
+        if part is not None:
+            size += _owned_bytes(part)
+    return size
+
+# live and pooled counts and bytes for each type, averaged over a sample of each list, plus tracemalloc's totals
+# when it's running
+def memory_report(sim: "Simulation"):
+    groups = [("players", sim.players, None), ("rocks", sim.rocks, None), ("lasers", sim.lasers, sim.laser_pool),
+              ("scrap", sim.scrap, sim.scrap_pool), ("enemies", sim.enemies, sim.enemy_pool)]
+    if sim.sector:
+        groups.append(("sleeping enemies", [e for enemies in sim.sector.enemies.values() for e in enemies], None))
+    report = {}
+    for name, objects, pool in groups:
+        sample = objects[:MEMORY_SAMPLE] or (pool.free[:MEMORY_SAMPLE] if pool else [])
+        each = sum(map(entity_bytes, sample)) / len(sample) if sample else 0
+        pooled = len(pool.free) if pool else 0
+        report[name] = {"live": len(objects), "pooled": pooled, "bytes_each": round(each), "bytes": round(each * (len(objects) + pooled))}
+    debris = sim.debris._arrays()
+    report["debris"] = {"live": len(sim.debris), "pooled": len(debris[0]) - len(sim.debris),
+                        "bytes_each": sum(arr.itemsize * arr[0].size for arr in debris), "bytes": sum(arr.nbytes for arr in debris)}
+    if sim.sector:
+        stats = sim.sector.stats()
+        count = stats["sleeping_rocks"]
+        report["sleeping rocks"] = {"live": count, "pooled": 0, "bytes_each": round(stats["rock_bytes"] / count) if count else 0,
+                                    "bytes": stats["rock_bytes"]}
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        report["traced"] = {"current": current, "peak": peak}
+    return report
+
+# builds `count` of every kind of entity with tracemalloc running, and puts what each one really allocated next to
+# the accounting above
+def measure_memory(count, seed=0):
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    sim = Simulation(seed)
+    place = lambda i: (i % WORLD_WIDTH, i // WORLD_WIDTH % WORLD_HEIGHT)
+    makers = [
+        ("rocks", sim.rocks, lambda i: Rock(place(i), sim.rng, sim.physics_world)),
+        ("lasers", sim.lasers, lambda i: sim.laser_pool.acquire(place(i), i % 360)),
+        ("scrap", sim.scrap, lambda i: sim.scrap_pool.acquire(place(i), (0, 0))),
+        ("enemies", sim.enemies, lambda i: sim.enemy_pool.acquire(place(i), sim)),
+    ]
+    traced = {}
+    for name, objects, make in makers:
+        gc.collect()
+        before = tracemalloc.get_traced_memory()[0]
+        objects.extend(make(i) for i in range(count))
+        gc.collect()
+        traced[name] = round((tracemalloc.get_traced_memory()[0] - before) / count)
+    report = memory_report(sim)
+    for name, each in traced.items():
+        report[name]["traced_each"] = each
+    if not tracing:
+        tracemalloc.stop()
+    return report
+
+def format_memory(report):
+    lines = [f"{'':<18}{'live':>8}{'pooled':>8}{'bytes each':>12}{'traced each':>13}{'KiB':>10}"]
+    for name, row in report.items():
+        if name == "traced":
+            continue
+        traced = row.get("traced_each")
+        lines.append(f"{name:<18}{row['live']:>8}{row['pooled']:>8}{row['bytes_each']:>12}{traced if traced is not None else '-':>13}"
+                     f"{row['bytes'] / 1024:>10.1f}")
+    if "traced" in report:
+        lines.append(f"tracemalloc: {report['traced']['current'] / 2**20:.1f} MiB now, {report['traced']['peak'] / 2**20:.1f} MiB peak")
+    return "\n".join(lines)
+
+### --- SPATIAL HASH --- ###
+# uniform grid broadphase - objects get bucketed into every cell their bounding box touches,
+# so only objects sharing a cell are ever distance-tested
+class SpatialHash:
+    def __init__(self, cell_size=128):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def clear(self):
+        self.cells.clear()
+
+    def cell_range(self, x, y, radius):
+        cs = self.cell_size
+        return int((x - radius) // cs), int((x + radius) // cs), int((y - radius) // cs), int((y + radius) // cs)
+
+    # indices must be inserted in increasing order, which keeps every cell list sorted
+    def insert(self, index, x, y, radius):
+        x0, x1, y0, y1 = self.cell_range(x, y, radius)
+        cells = self.cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = cells.get((cx, cy))
+                if cell is None:
+                    cells[(cx, cy)] = [index]
+                else:
+                    cell.append(index)
+
+    # every (i, j) pair with i < j that shares at least one cell, in the same order a nested all-pairs loop would visit them
+    def candidate_pairs(self):
+        pairs = set()
+        for cell in self.cells.values():
+            n = len(cell)
+            if n < 2:
+                continue
+            for i in range(n - 1):
+                a = cell[i]
+                for j in range(i + 1, n):
+                    pairs.add((a, cell[j]))
+        return sorted(pairs)
+
+    # every index in a cell that the segment's bounding box (grown by pad) touches
+    def query_segment(self, x0, y0, x1, y1, pad):
+        cs = self.cell_size
+        cells = self.cells
+        found = set()
+        for cx in range(int((min(x0, x1) - pad) // cs), int((max(x0, x1) + pad) // cs) + 1):
+            for cy in range(int((min(y0, y1) - pad) // cs), int((max(y0, y1) + pad) // cs) + 1):
+                cell = cells.get((cx, cy))
+                if cell:
+                    found.update(cell)
+        return found
+
+    # sweeps a circle of the given radius from (x0, y0) to (x1, y1) and returns the first thing it touches as
+    # (t along the segment, index), or None. index i is a circle at positions[i] of radii[i], and only counts if layers[i] & mask
+    def raycast(self, x0, y0, x1, y1, radius, positions, radii, layers, mask):
+        nearest = None
+        for i in self.query_segment(x0, y0, x1, y1, radius):
+            if not layers[i] & mask:
+                continue
+            pos = positions[i]
+            t = segment_circle(x0, y0, x1 - x0, y1 - y0, pos.x, pos.y, radii[i] + radius)
+            if t is not None and (nearest is None or (t, i) < nearest):
+                nearest = (t, i)
+        return nearest
+
+# how far along p + t*d (0 <= t <= 1) the point first comes within radius of c, None if it never does
+def segment_circle(px, py, dx, dy, cx, cy, radius):
+    fx = px - cx
+    fy = py - cy
+    c = fx*fx + fy*fy - radius*radius
+    if c < 0:
+        return 0.0
+    a = dx*dx + dy*dy
+    b = fx*dx + fy*dy
+    if a == 0 or b >= 0:
+        return None
+    disc = b*b - a*c
+    if disc < 0:
+        return None
+    t = (-b - math.sqrt(disc)) / a
+    return t if t <= 1 else None
+
+
+### --- AI SCHEDULER --- ###
+# spreads enemy think() calls over frames. enemies fighting close by re-plan every tick, ones further out or just
+# wandering re-plan less often, and at most `budget` enemies think per frame - the most overdue go first,
+# everyone else carries on with their last plan. interval_scale stretches every interval when frames get tight,
+# see FrameGovernor
+class AIScheduler:
+    def __init__(self, budget=64, near_interval=1, far_interval=4, wander_interval=8, near_range=600):
+        self.budget = budget
+        self.near_interval = near_interval
+        self.far_interval = far_interval
+        self.wander_interval = wander_interval
+        self.near_range = near_range
+        self.interval_scale = 1
+        self.stats = {"enemies": 0, "due": 0, "thought": 0, "deferred": 0}
+
+    def interval(self, enemy: "Enemy"):
+        if enemy.state == "wander":
+            interval = self.wander_interval
+        elif enemy.player_dist < self.near_range:
+            interval = self.near_interval
+        else:
+            interval = self.far_interval
+        return max(1, round(interval * self.interval_scale))
+
+    def schedule(self, enemies: list["Enemy"], tick):
+        due = [e for e in enemies if e.next_think <= tick]
+        if self.budget is not None and len(due) > self.budget:
+            due.sort(key=lambda e: e.next_think)
+            thinkers = due[:self.budget]
+        else:
+            thinkers = due
+        self.stats = {"enemies": len(enemies), "due": len(due), "thought": len(thinkers), "deferred": len(due) - len(thinkers)}
+        return thinkers
+
+    # next think lands on this enemy's slot within its interval, so enemies sharing an interval don't all think together
+    def planned(self, enemy: "Enemy", tick):
+        interval = self.interval(enemy)
+        enemy.next_think = tick + 1 + (enemy.think_slot - tick - 1) % interval
+
+### --- NEIGHBOR INDEX --- ###
+# numpy version of the spatial hash for point queries - points are sorted by grid cell once,
+# then all queries look up their surrounding cells together with searchsorted
+class NeighborIndex:
+    KEY_STRIDE = 1 << 20
+
+    def __init__(self, cell_size=140):
+        self.cell_size = cell_size
+        self.points = np.zeros((0, 2))
+        self.order = np.zeros(0, dtype=np.int64)
+        self.sorted_keys = np.zeros(0, dtype=np.int64)
+
+    def cells(self, points):
+        return np.floor(points / self.cell_size).astype(np.int64)
+
+    def build(self, points):
+        self.points = points
+        cells = self.cells(points)
+        keys = cells[:, 0] * self.KEY_STRIDE + cells[:, 1]
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    # every (query, point) pair closer than radius. returns query indices, point indices,
+    # the query - point offsets and their lengths
+    def query(self, queries, radius):
+        cells = self.cells(queries)
+        reach = int(np.ceil(radius / self.cell_size))
+        q_parts, p_parts = [], []
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                keys = (cells[:, 0] + dx) * self.KEY_STRIDE + (cells[:, 1] + dy)
+                starts = np.searchsorted(self.sorted_keys, keys, "left")
+                counts = np.searchsorted(self.sorted_keys, keys, "right") - starts
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+                offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                q_parts.append(np.repeat(np.arange(len(queries)), counts))
+                p_parts.append(self.order[np.repeat(starts, counts) + offsets])
+
+        if not q_parts:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros((0, 2)), np.zeros(0)
+        qi = np.concatenate(q_parts)
+        pi = np.concatenate(p_parts)
+        delta = queries[qi] - self.points[pi]
+        d = np.hypot(delta[:, 0], delta[:, 1])
+        within = d < radius
+        return qi[within], pi[within], delta[within], d[within]
+
 
 ### --- COLLISION HANDLER --- ###
+# what happens when two bodies touch is looked up by their types in a dispatch table - anything without
+# a registered handler just bounces. layers/masks have already thrown out pairs that don't interact
 class CollisionHandler:
-    def __init__(self, game_ctrl: "GameCtrl"):
+    def __init__(self, game_ctrl: "Simulation"):
         self.game = game_ctrl
-    
-    # combined collision handling method
+        self.handlers = {}
+        self.table = {}
+        self.contacts = []
+        self.register(Scrap, Player, self.scrap_player)
+        self.register(Laser, Player, self.laser_hit)
+        self.register(Laser, Enemy, self.laser_hit)
+        self.register(Laser, Rock, self.laser_hit)
+
+    # handler(a, b, to_remove) gets called with a of type_a and b of type_b, whichever way round the pair came in.
+    # subclasses pick up their base class's handlers
+    def register(self, type_a, type_b, handler):
+        self.handlers[(type_a, type_b)] = handler
+        if type_a is not type_b:
+            self.handlers[(type_b, type_a)] = lambda a, b, to_remove: handler(b, a, to_remove)
+        self.table.clear()
+
+    def resolve(self, type_a, type_b):
+        handler = self.table.get((type_a, type_b))
+        if handler is None:
+            handler = next((self.handlers[(a, b)] for a in type_a.__mro__ for b in type_b.__mro__ if (a, b) in self.handlers),
+                           self.default_collision)
+            self.table[(type_a, type_b)] = handler
+        return handler
+
+    @profiler.timed("CollisionHandler.handle")
     def handle(self, a: GameObject, b: GameObject, to_remove: set):
-        if self.laser_owner_ignore(a, b):
-            return
-        if self.scrap_player(a, b):
-            return
-        if self.laser_other(a, b, to_remove):
-            return
-        
-        self.default_collision(a, b)
-
-    # laser + owner = ignore collision
-    def laser_owner_ignore(self, a, b):
-        if isinstance(a, Laser):
-            if (a.owner == "player" and isinstance(b, Player)) or (a.owner == "enemy" and isinstance(b, Enemy)):
-                return True
-        if isinstance(b, Laser):
-            if (b.owner == "player" and isinstance(a, Player)) or (b.owner == "enemy" and isinstance(a, Enemy)):
-                return True
-        return False
-    
+        self.resolve(type(a), type(b))(a, b, to_remove)
+
     # scrap + player = remove scrap, increment points
-    def scrap_player(self, a, b):
-        if isinstance(a, Scrap) and isinstance(b, Player):
-            self.game.points += getattr(a, "point_value", 1)
-            a.timer = 0
-            return True
-        if isinstance(b, Scrap) and isinstance(a, Player):
-            self.game.points += getattr(b, "point_value", 1)
-            b.timer = 0
-            return True
-        return False
-    
-    # laser + other = deal laser damage
-    def laser_other(self, a, b, to_remove):
-        if isinstance(a, Laser) and not isinstance(b, (Laser)):
-            if (a.owner == "player" and isinstance(b, Player)) or (a.owner == "enemy" and isinstance(b, Enemy)):
-                return True
-            b.take_damage(a.damage)
-            to_remove.add(a)
-            return True
-        if isinstance(b, Laser) and not isinstance(a, (Laser)):
-            if (b.owner == "player" and isinstance(a, Player)) or (b.owner == "enemy" and isinstance(a, Enemy)):
-                return True
-            a.take_damage(b.damage)
-            to_remove.add(b)
-            return True
-        return False
+    def scrap_player(self, scrap: "Scrap", player: "Player", to_remove):
+        self.game.points += scrap.point_value
+        scrap.timer = 0
+
+    # laser + ship/rock = deal laser damage, laser is used up. an enemy only counts as a kill when it's a player's
+    # laser that finishes it off - crashes and rocks don't
+    def laser_hit(self, laser: "Laser", target: GameObject, to_remove):
+        alive = not target.is_dead()
+        target.take_damage(laser.damage)
+        if alive and target.is_dead() and laser.owner == "player" and isinstance(target, Enemy):
+            self.game.kills += 1
+        to_remove.add(laser)
 
     # default collision
-    def default_collision(self, a, b):
-        a.phys.handle_collision(b.phys)
-        b.phys.handle_collision(a.phys)
+    def default_collision(self, a, b, to_remove=None):
+        if a.phys.batched:
+            # bounced all at once in resolve_contacts()
+            self.contacts.append((a, b))
+            return
+        a.phys.handle_collision(b.phys, self.game.rng)
+        b.phys.handle_collision(a.phys, self.game.rng)
+        self.impact_damage(a, b, (a.phys.vel - b.phys.vel).length())
 
-        rel_vel = (a.phys.vel - b.phys.vel).length()
+    def impact_damage(self, a, b, rel_vel):
         if a.phys.mass > 0.1 and b.phys.mass > 0.1 and rel_vel > 0:
             dmg_mltplr = 2.0    # damage multiplier
             dmg1 = rel_vel * (b.phys.mass / a.phys.mass) * dmg_mltplr
@@ -559,158 +2116,1536 @@ class CollisionHandler:
             a.take_damage(dmg1)
             b.take_damage(dmg2)
 
-### --- GAME CONTROL --- ###
-class GameCtrl:
-    def __init__(self):
-        pygame.init()
-        self.game_font = pygame.font.SysFont("Lucida Sans", 24)
-        self.clock = pygame.time.Clock()
-        self.background = pygame.image.load("background.png")
-        self.window = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-        self.collision = CollisionHandler(self)
+    def resolve_contacts(self):
+        if not self.contacts:
+            return
+        a = body_rows([a for a, _ in self.contacts])
+        b = body_rows([b for _, b in self.contacts])
+        rel_vel = self.game.physics_world.resolve_contacts(a, b, self.game.rng)
+        for (obj1, obj2), speed in zip(self.contacts, rel_vel.tolist()):
+            self.impact_damage(obj1, obj2, speed)
+        self.contacts.clear()
+
+### --- SECTOR --- ###
+# where the window's top left sits in the world - the camera keeps focus in the middle and stops at the world's edges
+def camera_origin(focus):
+    return (max(0, min(WORLD_WIDTH - WINDOW_WIDTH, int(focus.x - WINDOW_WIDTH / 2))),
+            max(0, min(WORLD_HEIGHT - WINDOW_HEIGHT, int(focus.y - WINDOW_HEIGHT / 2))))
+
+# a world bigger than the window, cut into chunk_size squares. only the chunks within margin of the view are awake,
+# and their objects live in the simulation's lists like always. everything further out is asleep: rocks are packed
+# into rows of one numpy array and drift in straight lines, caught up in a single vectorized step every `interval`
+# ticks (and whenever the view reaches new chunks) - that step is also how they drift back into range. sleeping
+# enemies are frozen in their chunk. lasers and scrap that leave the awake chunks are dropped
+class Sector:
+    # one array per field - scale is always the mass for a rock that isn't breaking, and spin only gets carried along
+    ROCK_VECTORS = ("pos", "vel")
+    ROCK_SCALARS = ("facing", "spin_speed", "spin", "mass", "hp", "max_hp", "radius", "slept_at")
+
+    def __init__(self, width=None, height=None, chunk_size=CHUNK_SIZE, margin=WAKE_MARGIN, interval=SLEEP_INTERVAL):
+        self.width = WORLD_WIDTH if width is None else width
+        self.height = WORLD_HEIGHT if height is None else height
+        self.chunk_size = chunk_size
+        self.margin = margin
+        self.interval = interval
+        for name in self.ROCK_VECTORS:
+            setattr(self, name, np.zeros((1024, 2)))
+        for name in self.ROCK_SCALARS:
+            setattr(self, name, np.zeros(1024))
+        self.rock_count = 0
+        self.enemies = {}   # (cx, cy) -> the enemies asleep in that chunk
+        self.bounds = None  # the awake chunks as (cx0, cy0, cx1, cy1), inclusive
+
+    def sleeping(self):
+        return self.rock_count + sum(len(enemies) for enemies in self.enemies.values())
+
+    def key(self, pos):
+        return int(pos.x // self.chunk_size), int(pos.y // self.chunk_size)
+
+    def awake_bounds(self, focus):
+        x, y = camera_origin(focus)
+        size = self.chunk_size
+        return (int((x - self.margin) // size), int((y - self.margin) // size),
+                int((x + WINDOW_WIDTH + self.margin) // size), int((y + WINDOW_HEIGHT + self.margin) // size))
+
+    # which of the (n, 2) positions are in an awake chunk, or within `grow` chunks of one
+    def awake(self, positions, grow=0):
+        cx0, cy0, cx1, cy1 = self.bounds
+        cx, cy = np.floor(positions / self.chunk_size).T
+        return (cx >= cx0 - grow) & (cx <= cx1 + grow) & (cy >= cy0 - grow) & (cy <= cy1 + grow)
+
+    def _arrays(self):
+        return [getattr(self, name) for name in self.ROCK_VECTORS + self.ROCK_SCALARS]
+
+    def _reserve(self, needed):
+        capacity = len(self.mass)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in self.ROCK_VECTORS + self.ROCK_SCALARS:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:])
+            new[:self.rock_count] = old[:self.rock_count]
+            setattr(self, name, new)
+
+    def sleep_rocks(self, rocks: list["Rock"], tick):
+        start = self.rock_count
+        end = start + len(rocks)
+        self._reserve(end)
+        self.pos[start:end] = body_positions(rocks)
+        columns = [(r.phys.vel.x, r.phys.vel.y, r.phys.facing, r.phys.spin_speed, r.phys.spin, r.phys.mass,
+                    r.health.hp, r.health.max_hp, r.phys.wrap_radius) for r in rocks]
+        columns = np.array(columns).reshape(-1, 9)
+        self.vel[start:end] = columns[:, :2]
+        for i, name in enumerate(self.ROCK_SCALARS[:-1]):
+            getattr(self, name)[start:end] = columns[:, 2 + i]
+        self.slept_at[start:end] = tick
+        self.rock_count = end
+
+    # turns the given rows back into rocks for the simulation - they have to have been caught up already.
+    # the last rows move into the holes they leave
+    def wake_rocks(self, sim: "Simulation", woken):
+        n = self.rock_count - len(woken)
+        holes = woken[woken < n]
+        tail = np.setdiff1d(np.arange(n, self.rock_count), woken)
+        rows = zip(*(arr[woken].tolist() for arr in self._arrays()))
+        for arr in self._arrays():
+            arr[holes] = arr[tail]
+        self.rock_count = n
+        for pos, vel, facing, spin_speed, spin, mass, hp, max_hp, radius, _ in rows:
+            x, y = pos
+            vx, vy = vel
+            rock = Rock.blank(sim.physics_world)
+            rock.phys.place((x, y), (vx, vy), facing)
+            rock.phys.mass = mass
+            rock.phys.spin_speed = spin_speed
+            rock.phys.spin = spin
+            rock.phys.wrap_radius = radius
+            rock.graphics.scale = mass
+            rock.health.max_hp = max_hp
+            rock.health.hp = hp
+            sim.rocks.append(rock)
+
+    # sleeping rocks (a slice or index array of rows) straight to where they would be at tick, wrapping at the
+    # world's edges like Physics does
+    def drift(self, tick, rows):
+        elapsed = tick - self.slept_at[rows]
+        radius = self.radius[rows][:, None]
+        span = np.array((self.width, self.height)) + 2 * radius
+        self.pos[rows] = (self.pos[rows] + self.vel[rows] * elapsed[:, None] + radius) % span - radius
+        self.facing[rows] = (self.facing[rows] + self.spin_speed[rows] * elapsed) % 360
+        self.slept_at[rows] = tick
+
+    def sleep_enemy(self, enemy: "Enemy"):
+        self.enemies.setdefault(self.key(enemy.phys.pos), []).append(enemy)
+
+    def clear(self, sim: "Simulation"):
+        self.rock_count = 0
+        for enemies in self.enemies.values():
+            for e in enemies:
+                sim.enemy_pool.release(e)
+        self.enemies.clear()
+
+    # runs at the end of every tick: wakes whatever the view has just reached, puts anything that has left the
+    # awake chunks to sleep, and lets 1/interval of the sleeping rocks drift (waking any that drifted in)
+    def update(self, sim: "Simulation"):
+        tick = sim.tick
+        bounds = self.awake_bounds(sim.player.phys.pos)
+        moved = bounds != self.bounds
+        if moved:
+            self.bounds = bounds
+            cx0, cy0, cx1, cy1 = bounds
+            for key in [key for key in self.enemies if cx0 <= key[0] <= cx1 and cy0 <= key[1] <= cy1]:
+                sim.enemies.extend(self.enemies.pop(key))
+
+        for kind in ("lasers", "scrap", "rocks", "enemies"):
+            objects = getattr(sim, kind)
+            if not objects:
+                continue
+            outside = ~self.awake(body_positions(objects))
+            if not outside.any():
+                continue
+            leaving = [obj for obj, out in zip(objects, outside.tolist()) if out]
+            # a breaking rock is gone in a few ticks anyway
+            if kind == "rocks":
+                leaving = [rock for rock in leaving if not rock.is_breaking]
+            pool = {"lasers": sim.laser_pool, "scrap": sim.scrap_pool}.get(kind)
+            if kind == "rocks":
+                self.sleep_rocks(leaving, tick)
+            # sleeping enemies keep their bodies, sleeping rocks are just rows in the sector now
+            compact(objects, set(leaving).__contains__, pool, release=kind != "enemies")
+            if kind == "enemies":
+                for e in leaving:
+                    self.sleep_enemy(e)
+
+        n = self.rock_count
+        if moved:
+            # nothing sleeping has had time to drift further than a chunk since its last step
+            rows = np.flatnonzero(self.awake(self.pos[:n], grow=1))
+            self.drift(tick, rows)
+            woken = rows[self.awake(self.pos[rows])]
+        else:
+            # this tick's share is one contiguous block of rows
+            share = -(-n // self.interval)
+            start = tick % self.interval * share
+            rows = slice(start, min(n, start + share))
+            self.drift(tick, rows)
+            woken = np.flatnonzero(self.awake(self.pos[rows])) + start
+        if len(woken):
+            self.wake_rocks(sim, woken)
+
+    # scatters rocks over the whole world, leaving the player's starting view clear
+    def populate(self, sim: "Simulation", count):
+        rng = sim.rng
+        focus = sim.player.phys.pos
+        self.bounds = self.awake_bounds(focus)
+        view = pygame.Rect(camera_origin(focus), (WINDOW_WIDTH, WINDOW_HEIGHT))
+        rocks = []
+        for _ in range(count):
+            pos = (rng.rocks.uniform(0, self.width), rng.rocks.uniform(0, self.height))
+            while view.collidepoint(pos):
+                pos = (rng.rocks.uniform(0, self.width), rng.rocks.uniform(0, self.height))
+            rocks.append(Rock(pos, rng, sim.physics_world))
+        self.sleep_rocks(rocks, sim.tick)
+        for rock in rocks:
+            rock.phys.release()
+        self.wake_rocks(sim, np.flatnonzero(self.awake(self.pos[:self.rock_count])))
+
+    def stats(self):
+        cx0, cy0, cx1, cy1 = self.bounds
+        return {"awake_chunks": (cx1 - cx0 + 1) * (cy1 - cy0 + 1), "sleeping_rocks": self.rock_count,
+                "sleeping_enemies": self.sleeping() - self.rock_count, "rock_bytes": sum(arr.nbytes for arr in self._arrays())}
+
+### --- SIMULATION --- ###
+# the game world and its rules, with no window, clock or keyboard attached -
+# step() advances exactly one tick, as fast as the caller wants
+class Simulation:
+    # params overrides any of DEFAULT_PARAMS
+    def __init__(self, seed=None, params=None):
+        self.seed = GameRandom.new_seed() if seed is None else seed
+        self.params = {**DEFAULT_PARAMS, **(params or {})}
+        self.batched = PHYSICS_WORLD
+        self.physics_world = PhysicsWorld() if PHYSICS_WORLD else None
+        self.rng = GameRandom(self.seed)
+        # numbers the enemies as they're made, so each gets its own think slot - see AIScheduler.planned
+        self.enemies_spawned = 0
+        self.recorder = None
 
+        self.collision = CollisionHandler(self)
+        self.broadphase = SpatialHash()
+        self.neighbors = NeighborIndex()
+        self.ai = AIScheduler()
+        self.laser_pool = ObjectPool(Laser, self.physics_world)
+        self.scrap_pool = ObjectPool(Scrap, self.physics_world)
+        self.enemy_pool = ObjectPool(Enemy, self.physics_world)
+
+        self.tick = 0
         self.points = 0
-        self.player = Player()
+        self.kills = 0
+        self.player = Player(self.physics_world)
+        # the first player is this machine's, any others are added by net.py
+        self.players = [self.player]
         self.lasers = []
         self.rocks = []
-        self.debris = []
+        self.debris = ParticleSystem(rng=self.rng.particles)
         self.scrap = []
         self.enemies = []
         
         self.spawn_timer = 0
         self.enemy_spawn_timer = 0
 
-        self.main_loop()
-
-    def main_loop(self):
-        while True:
-            self.check_events()
-            self.update()
-            self.draw_window()
-            self.clock.tick(60)
-
-    def check_events(self):
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                exit()
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_SPACE:
-                    # Shoot laser from player's position and angle
-                    self.lasers.append(Laser(self.player.phys.pos, self.player.phys.facing, owner="player"))
+        # only worlds bigger than the window need chunking
+        self.sector = None
+        if WORLD_WIDTH > WINDOW_WIDTH or WORLD_HEIGHT > WINDOW_HEIGHT:
+            self.sector = Sector()
+            screens = WORLD_WIDTH * WORLD_HEIGHT / (WINDOW_WIDTH * WINDOW_HEIGHT)
+            self.sector.populate(self, round(WORLD_ROCK_DENSITY * screens))
 
-    def update(self):
-        self.player.update()
+    def step(self, inputs: Inputs):
+        if self.batched:
+            self.physics_world.remember(body_rows(self.all_objects()))
+        else:
+            for obj in self.all_objects():
+                obj.phys.remember()
+        self.player.inputs = inputs
+        for player in self.players:
+            if player.inputs.fire:
+                # Shoot laser from player's position and angle
+                self.lasers.append(self.laser_pool.acquire(player.phys.pos, player.phys.facing, owner="player"))
+        self.update(inputs)
+        self.tick += 1
+        if self.recorder is not None:
+            self.recorder.record(self, inputs)
+
+    # controller is either a callable taking the simulation and returning Inputs, or an iterable of Inputs
+    def run(self, ticks, controller=None):
+        if controller is None:
+            idle = Inputs()
+            controller = lambda sim: idle
+        if callable(controller):
+            for _ in range(ticks):
+                self.step(controller(self))
+        else:
+            script = iter(controller)
+            for _ in range(ticks):
+                self.step(next(script, Inputs()))
+
+    @profiler.timed("update_player")
+    def update_player(self, inputs: Inputs):
+        self.player.update(inputs)
+        for player in self.players[1:]:
+            player.update(player.inputs)
+
+    # another ship in the same world, steered through its inputs attribute
+    def add_player(self):
+        player = Player(self.physics_world)
+        self.players.append(player)
+        return player
+
+    def remove_player(self, player: "Player"):
+        self.players.remove(player)
+        player.phys.release()
+
+    def update(self, inputs: Inputs):
+        self.update_player(inputs)
         self.update_lasers()
         self.update_rocks()
         self.update_debris()
         self.update_scrap()
         self.update_enemies()
+        if self.batched:
+            self.integrate()
         self.check_collisions()
+        if self.sector:
+            self.update_sector()
+
+    # the physics world moves everything in one go once all the updates have set their accelerations
+    @profiler.timed("integrate")
+    def integrate(self):
+        moving = self.players + [r for r in self.rocks if not r.is_breaking] + self.lasers + self.scrap + self.enemies
+        self.physics_world.step(body_rows(moving))
+
+    @profiler.timed("update_sector")
+    def update_sector(self):
+        self.sector.update(self)
+
+    # 64-bit digest of everything that matters to the simulation, for catching replay divergence
+    def state_hash(self):
+        values = array.array("d", (self.tick, self.points, len(self.debris)))
+        for group in (self.players, self.rocks, self.lasers, self.scrap, self.enemies):
+            values.append(len(group))
+            for obj in group:
+                phys = obj.phys
+                values.extend((phys.pos.x, phys.pos.y, phys.vel.x, phys.vel.y, phys.facing, obj.hp()))
+        digest = hashlib.blake2b(values.tobytes(), digest_size=8)
+        digest.update(self.debris.pos[:len(self.debris)].tobytes())
+        return int.from_bytes(digest.digest(), "little")
+
+    def all_objects(self):
+        return self.players + self.rocks + self.lasers + self.scrap + self.enemies
+
+    def pool_stats(self):
+        return {
+            "lasers": self.laser_pool.stats(),
+            "scrap": self.scrap_pool.stats(),
+            "enemies": self.enemy_pool.stats(),
+        }
+
+    def entity_counts(self):
+        counts = {
+            "lasers": len(self.lasers),
+            "rocks": len(self.rocks),
+            "debris": len(self.debris),
+            "scrap": len(self.scrap),
+            "enemies": len(self.enemies),
+        }
+        if self.sector:
+            counts["asleep"] = self.sector.sleeping()
+        return counts
         
+    @profiler.timed("update_lasers")
     def update_lasers(self):
         for laser in self.lasers:
             laser.update()
-        self.lasers = [l for l in self.lasers if not l.is_expired()]
+        compact(self.lasers, Laser.is_expired, self.laser_pool)
 
+    @profiler.timed("update_rocks")
     def update_rocks(self):
         for rock in self.rocks:
             if rock.health.hp <= 0 and not rock.is_breaking:
                 rock.start_breaking()
-                for _ in range(random.randint(8,16)):
-                    self.debris.append(Debris(rock.phys.pos))
-                if random.random() < 0.5:
-                    value = random.randint(1,10)
-                    self.scrap.append(Scrap(rock.phys.pos, rock.phys.vel, value))
+                self.debris.emit(rock.phys.pos, self.rng.drops.randint(8,16))
+                if self.rng.drops.random() < 0.5:
+                    value = self.rng.drops.randint(1,10)
+                    self.scrap.append(self.scrap_pool.acquire(rock.phys.pos, rock.phys.vel, value))
             rock.update()
-        self.rocks = [r for r in self.rocks if not r.is_dead()]
+        compact(self.rocks, Rock.is_dead)
         self.spawner()
 
+    @profiler.timed("update_debris")
     def update_debris(self):
-        for d in self.debris:
-            d.update()
-        self.debris = [d for d in self.debris if not d.is_expired()]
+        self.debris.update()
 
+    @profiler.timed("update_scrap")
     def update_scrap(self):
         for s in self.scrap:
             s.update()
-        self.scrap = [s for s in self.scrap if not s.is_expired()]
+        compact(self.scrap, Scrap.is_expired, self.scrap_pool)
 
+    @profiler.timed("update_enemies")
     def update_enemies(self):
+        thinkers = self.ai.schedule(self.enemies, self.tick)
+        steering = Enemy.steer_all(self.players, self.rocks, self.enemies, self.neighbors, thinkers)
+        for e, steer in zip(thinkers, steering):
+            e.think(steer)
+            self.ai.planned(e, self.tick)
         for e in self.enemies:
-            e.update(self.player, self.rocks, self.enemies)
+            e.act()
             if e.health.hp <= 0:
-                for _ in range(random.randint(6, 12)):
-                    self.debris.append(Debris(e.phys.pos, colour=(200,120,120)))
-                if random.random() < 0.6:
-                    value = random.randint(3, 12)
-                    self.scrap.append(Scrap(e.phys.pos, e.phys.vel, value))
-        self.enemies = [e for e in self.enemies if e.health.hp > 0]
+                self.debris.emit(e.phys.pos, self.rng.drops.randint(6, 12), colour=(200,120,120))
+                if self.rng.drops.random() < 0.6:
+                    value = self.rng.drops.randint(3, 12)
+                    self.scrap.append(self.scrap_pool.acquire(e.phys.pos, e.phys.vel, value))
+        compact(self.enemies, Enemy.is_dead, self.enemy_pool)
 
+    # new arrivals come in from just off screen, wherever the camera is
     def spawner(self):
+        params = self.params
+        origin = camera_origin(self.player.phys.pos)
         self.spawn_timer += 1
-        if self.spawn_timer > 120 and len(self.rocks) <= 10:
+        if self.spawn_timer > params["rock_spawn_interval"] and len(self.rocks) <= params["max_rocks"]:
             self.spawn_timer = 0
-            Rock.spawn_random(self.rocks)
+            Rock.spawn_random(self, origin)
 
         self.enemy_spawn_timer += 1
-        if self.enemy_spawn_timer > 420 and len(self.enemies) < 2:
+        if self.enemy_spawn_timer > params["enemy_spawn_interval"] and len(self.enemies) < params["max_enemies"]:
             self.enemy_spawn_timer = 0
-            e = Enemy.spawn_random()
-            e.game = self  # allow enemy to emit lasers into game
-            self.enemies.append(e)
+            self.enemies.append(Enemy.spawn_random(self, origin))
 
+    @profiler.timed("check_collisions")
     def check_collisions(self):
         to_remove = set()
-        all_objects = [self.player] + self.rocks + self.lasers + self.scrap + self.enemies
-        for i, obj1 in enumerate(all_objects):
-            for obj2 in all_objects[i+1:]:
-                if obj1.get_radius() and obj2.get_radius():
-                    if obj1.collides_with(obj2):
-                        self.collision.handle(obj1, obj2, to_remove)
-        
+        # lasers are swept separately below
+        all_objects = self.players + self.rocks + self.scrap + self.enemies
+
+        # broadphase - radii are looked up once per object, objects without one or without a mask never collide
+        self.broadphase.clear()
+        radii = []
+        layers = []
+        masks = []
+        if self.batched:
+            positions = [pygame.Vector2(pos) for pos in body_positions(all_objects).tolist()]
+        else:
+            positions = [obj.phys.pos for obj in all_objects]
+        for i, obj in enumerate(all_objects):
+            radius = obj.get_radius()
+            pos = positions[i]
+            radii.append(radius)
+            layers.append(obj.collision_layer)
+            masks.append(obj.collision_mask)
+            if radius and obj.collision_mask:
+                self.broadphase.insert(i, pos.x, pos.y, radius)
+
+        for i, j in self.broadphase.candidate_pairs():
+            # pairs that can't interact are dropped before the distance test
+            if not (masks[i] & layers[j] and masks[j] & layers[i]):
+                continue
+            if positions[i].distance_to(positions[j]) < radii[i] + radii[j]:
+                self.collision.handle(all_objects[i], all_objects[j], to_remove)
+        self.collision.resolve_contacts()
+
+        self.sweep_lasers(all_objects, positions, radii, layers, to_remove)
+
         # remove marked lasers
-        self.lasers = [l for l in self.lasers if l not in to_remove]
-
-    def draw_window(self):
-        # parallax the background based on player position
-        parallax_factor = 0.2
-        bg_width, bg_height = self.background.get_width(), self.background.get_height()
-        offset_x = int(self.player.phys.pos.x * parallax_factor)
-        offset_y = int(self.player.phys.pos.y * parallax_factor)
-        max_x = bg_width - WINDOW_WIDTH
-        max_y = bg_height - WINDOW_HEIGHT
-        offset_x = max(0, min(offset_x, max_x))
-        offset_y = max(0, min(offset_y, max_y))
-        self.window.blit(self.background, (-offset_x, -offset_y))
+        if to_remove:
+            compact(self.lasers, to_remove.__contains__, self.laser_pool)
 
-        # draw all existing game objects - keeping the layer order sensible (e.g. scrap below rocks)
+    # each laser is a segment from where it was last tick to where it is now, and hits only the first thing along it -
+    # so a fast laser (or a slow tick rate) can't skip over something small
+    def sweep_lasers(self, bodies: list, positions: list, radii: list, layers: list, to_remove: set):
         for laser in self.lasers:
-            laser.draw(self.window)
-        self.player.draw(self.window)
-        for enemy in self.enemies:
-            enemy.draw(self.window)
-        for scrap in self.scrap:
-            scrap.draw(self.window)
-        for rock in self.rocks:
-            rock.draw(self.window)
-        for debr in self.debris:
-            debr.draw(self.window)
+            start = laser.phys.prev_pos
+            end = laser.phys.pos
+            hit = self.broadphase.raycast(start.x, start.y, end.x, end.y, laser.get_radius(), positions, radii, layers, laser.collision_mask)
+            if hit is not None:
+                target = bodies[hit[1]]
+                if target.collision_mask & laser.collision_layer:
+                    self.collision.handle(laser, target, to_remove)
+
+### --- INPUT LOG --- ###
+# params as JSON, for input logs and snapshots - the (low, high) ranges come back as tuples, like DEFAULT_PARAMS
+def encode_params(params):
+    return json.dumps(params, sort_keys=True).encode()
+
+def decode_params(data):
+    return {name: tuple(value) if isinstance(value, list) else value for name, value in json.loads(bytes(data)).items()}
+
+# a recorded session: the seed, params, world size and physics mode plus one byte of Inputs bits per tick, run-length
+# encoded on disk, with a state hash every hash_interval ticks so a replay can tell exactly when it stopped matching
+class InputLog:
+    MAGIC = b"SGIL"
+    # bumped whenever the state hash or the simulation changes, so logs that can't verify any more are refused on load
+    # instead of reporting a divergence. 2: health-less lasers hash as 0 hp, and the wander timer fix. 3: world size
+    # and physics mode in the header. 4: the simulation's params
+    VERSION = 4
+    HEADER = struct.Struct("<4sHQIIII?I")   # magic, version, seed, ticks, hash interval, world size, physics world, params size
+
+    # the world size and physics mode default to whatever this process is running with
+    def __init__(self, seed, hash_interval=60, world=None, physics_world=None, params=None):
+        self.seed = seed
+        self.params = {**DEFAULT_PARAMS, **(params or {})}
+        self.hash_interval = hash_interval
+        self.world = world or (WORLD_WIDTH, WORLD_HEIGHT)
+        self.physics_world = PHYSICS_WORLD if physics_world is None else physics_world
+        self.inputs = bytearray()
+        self.hashes = array.array("Q")
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def record(self, sim: Simulation, inputs: Inputs):
+        self.inputs.append(inputs.to_bits())
+        if sim.tick % self.hash_interval == 0:
+            self.hashes.append(sim.state_hash())
+
+    # (bits, run length) pairs, the length as a varint - held keys make for very long runs
+    def encode_inputs(self):
+        out = bytearray()
+        i = 0
+        while i < len(self.inputs):
+            value = self.inputs[i]
+            run = 1
+            while i + run < len(self.inputs) and self.inputs[i + run] == value:
+                run += 1
+            out.append(value)
+            n = run
+            while n >= 0x80:
+                out.append(n & 0x7f | 0x80)
+                n >>= 7
+            out.append(n)
+            i += run
+        return bytes(out)
+
+    @staticmethod
+    def decode_inputs(data):
+        inputs = bytearray()
+        i = 0
+        while i < len(data):
+            value = data[i]
+            i += 1
+            run = shift = 0
+            while True:
+                byte = data[i]
+                i += 1
+                run |= (byte & 0x7f) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            inputs.extend(bytes((value,)) * run)
+        return inputs
+
+    def save(self, path):
+        encoded = self.encode_inputs()
+        params = encode_params(self.params)
+        with open(path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.seed, len(self.inputs), self.hash_interval, *self.world,
+                                     self.physics_world, len(params)))
+            f.write(params)
+            f.write(struct.pack("<II", len(encoded), len(self.hashes)))
+            f.write(encoded)
+            f.write(self.hashes.tobytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:4] != cls.MAGIC or len(data) < cls.HEADER.size:
+            raise ValueError(f"{path} is not an input log")
+        magic, version, seed, ticks, hash_interval, width, height, physics_world, params_size = cls.HEADER.unpack_from(data)
+        if version != cls.VERSION:
+            raise ValueError(f"{path} is a version {version} input log, this build only replays version {cls.VERSION}")
+        offset = cls.HEADER.size + params_size
+        params = decode_params(data[cls.HEADER.size:offset])
+        encoded_len, hash_count = struct.unpack_from("<II", data, offset)
+        offset += 8
+        log = cls(seed, hash_interval, (width, height), physics_world, params)
+        log.inputs = cls.decode_inputs(data[offset:offset + encoded_len])
+        log.hashes.frombytes(data[offset + encoded_len:offset + encoded_len + hash_count * 8])
+        if len(log.inputs) != ticks:
+            raise ValueError(f"{path} is truncated: {len(log.inputs)} of {ticks} ticks")
+        return log
+
+    # re-runs the session as fast as possible. returns the first tick whose state hash didn't match, or None.
+    # without a simulation to replay into, this process switches to the recorded world size and physics mode
+    def replay(self, sim: Simulation = None):
+        global PHYSICS_WORLD, WORLD_WIDTH, WORLD_HEIGHT
+        if sim is None:
+            PHYSICS_WORLD = self.physics_world
+            WORLD_WIDTH, WORLD_HEIGHT = self.world
+            sim = Simulation(self.seed, self.params)
+        elif sim.batched != self.physics_world or (WORLD_WIDTH, WORLD_HEIGHT) != self.world:
+            raise ValueError(f"recorded in a {self.world[0]}x{self.world[1]} world with the physics world "
+                             f"{'on' if self.physics_world else 'off'}, which this simulation isn't")
+        hashes = iter(self.hashes)
+        for bits in self.inputs:
+            sim.step(Inputs.from_bits(bits))
+            if sim.tick % self.hash_interval == 0 and sim.state_hash() != next(hashes, None):
+                return sim.tick
+        return None
+
+### --- SNAPSHOTS --- ###
+# the whole world as a flat binary blob - one fixed-size record per object, in a numpy structured array per kind,
+# so encoding and decoding is a few bulk copies instead of pickling an object graph. floats stay doubles,
+# so a restored world carries on exactly as the original would have. unknown sections are skipped on load
+class Snapshot:
+    MAGIC = b"SGSS"
+    # 2: sleeping sector sections (SROK, SENM) and a PLYR row per ship. 3: kills, and the params (PARM)
+    VERSION = 3
+    HEADER = struct.Struct("<4sHQqIQiiIH")  # magic, version, tick, points, kills, seed, spawn timers, enemies spawned, sections
+    SECTION = struct.Struct("<4sII")        # tag, record count, payload size
+
+    BODY = [("x", "<f8"), ("y", "<f8"), ("vx", "<f8"), ("vy", "<f8"), ("facing", "<f8"), ("hp", "<f8")]
+    PLAYER = np.dtype(BODY + [("max_hp", "<f8"), ("turn_vel", "<f8")])
+    ROCK = np.dtype(BODY + [("max_hp", "<f8"), ("mass", "<f8"), ("scale", "<f8"), ("spin_speed", "<f8"), ("spin", "<f8"),
+                            ("breaking", "u1"), ("break_timer", "<i4")])
+    LASER = np.dtype(BODY + [("dir_x", "<f8"), ("dir_y", "<f8"), ("travelled", "<f8"), ("owner", "u1"), ("colour", "u1", 3)])
+    SCRAP = np.dtype(BODY + [("value", "<i4"), ("timer", "<i4"), ("age", "<i4")])
+    ENEMY = np.dtype(BODY + [
+        ("turn_vel", "<f8"), ("max_speed", "<f8"), ("thrust", "<f8"), ("max_turn_speed", "<f8"),
+        ("accuracy", "<f8"), ("aggression", "<f8"), ("bravery", "<f8"), ("preferred_range", "<f8"), ("fire_range", "<f8"),
+        ("fire_cooldown_base", "<i4"), ("fire_cooldown", "<i4"), ("state", "u1"), ("wander_timer", "<i4"), ("wander_dir", "<f8"),
+        ("player_dist", "<f8"), ("desired_angle", "<f8"), ("move", "u1"), ("can_fire", "u1"), ("sep_x", "<f8"), ("sep_y", "<f8"),
+        ("next_think", "<i4"), ("think_slot", "<i4"), ("strafe_dir", "i1"),
+    ])
+    PCG64 = struct.Struct("<16s16sBI")      # state, increment, has_uint32, uinteger
+
+    OWNERS = ("player", "enemy")
+    STATES = ("wander", "attack", "flee")
+    MOVES = ("approach", "retreat", "strafe")
+
+    @staticmethod
+    def _body(obj):
+        pos = obj.phys.pos
+        vel = obj.phys.vel
+        return (pos.x, pos.y, vel.x, vel.y, obj.phys.facing, obj.hp())
+
+    @staticmethod
+    def _records(dtype, rows):
+        rows = list(rows)
+        return len(rows), np.array(rows, dtype=dtype).tobytes()
+
+    @classmethod
+    def _enemy(cls, e: "Enemy"):
+        return cls._body(e) + (
+            e.turn_vel, e.max_speed, e.thrust, e.max_turn_speed,
+            e.accuracy, e.aggression, e.bravery, e.preferred_range, e.fire_range,
+            e.fire_cooldown_base, e.fire_cooldown, cls.STATES.index(e.state), e.wander_timer, e.wander_dir,
+            e.player_dist, e.desired_angle, cls.MOVES.index(e.move), e.can_fire, e.separation.x, e.separation.y,
+            e.next_think, e.think_slot, e.strafe_dir)
+
+    # sleeping=False leaves out a big world's sleeping rocks and enemies, for a copy that only gets drawn
+    @classmethod
+    def encode(cls, sim: "Simulation", sleeping=True):
+        body = cls._body
+        sections = [
+            (b"PLYR",) + cls._records(cls.PLAYER, (body(p) + (p.health.max_hp, p.turn_vel) for p in sim.players)),
+            (b"ROCK",) + cls._records(cls.ROCK, (body(r) + (r.health.max_hp, r.phys.mass, r.graphics.scale, r.phys.spin_speed,
+                                                            r.phys.spin, r.is_breaking, r.break_timer) for r in sim.rocks)),
+            (b"LASR",) + cls._records(cls.LASER, (body(l) + (l.dir.x, l.dir.y, l.distance_travelled, cls.OWNERS.index(l.owner),
+                                                             l.colour) for l in sim.lasers)),
+            (b"SCRP",) + cls._records(cls.SCRAP, (body(s) + (s.point_value, s.timer, s.age) for s in sim.scrap)),
+            (b"ENMY",) + cls._records(cls.ENEMY, map(cls._enemy, sim.enemies)),
+            (b"DEBR",) + cls._encode_debris(sim.debris),
+            (b"PALT", len(sim.debris.palette), bytes(c for colour in sim.debris.palette for c in colour)),
+            (b"RAND", len(GameRandom.STREAMS) + 1, cls._encode_rng(sim.rng)),
+            (b"PARM", len(sim.params), encode_params(sim.params)),
+        ]
+        # a big world's sleeping rocks are already flat records, sleeping enemies go chunk by chunk
+        if sim.sector and sleeping:
+            sector = sim.sector
+            sections.append((b"SROK", sector.rock_count, b"".join(arr[:sector.rock_count].tobytes() for arr in sector._arrays())))
+            sections.append((b"SENM",) + cls._records(cls.ENEMY, (cls._enemy(e) for chunk in sector.enemies.values() for e in chunk)))
+        out = [cls.HEADER.pack(cls.MAGIC, cls.VERSION, sim.tick, sim.points, sim.kills, sim.seed,
+                               sim.spawn_timer, sim.enemy_spawn_timer, sim.enemies_spawned, len(sections))]
+        for tag, count, payload in sections:
+            out.append(cls.SECTION.pack(tag, count, len(payload)))
+            out.append(payload)
+        return b"".join(out)
+
+    @staticmethod
+    def _encode_debris(debris: "ParticleSystem"):
+        n = debris.count
+        return n, b"".join(arr[:n].tobytes() for arr in debris._arrays())
+
+    # each python stream's mersenne twister words and cached gauss, then the particle generator's PCG64 state
+    @classmethod
+    def _encode_rng(cls, rng: "GameRandom"):
+        out = []
+        for name in GameRandom.STREAMS:
+            _, words, gauss = getattr(rng, name).getstate()
+            out.append(array.array("I", words).tobytes())
+            out.append(struct.pack("<?d", gauss is not None, gauss or 0.0))
+        state = rng.particles.bit_generator.state
+        out.append(cls.PCG64.pack(state["state"]["state"].to_bytes(16, "little"), state["state"]["inc"].to_bytes(16, "little"),
+                                  state["has_uint32"], state["uinteger"]))
+        return b"".join(out)
+
+    # restores into an existing simulation, reusing its objects and pools wherever it can
+    @classmethod
+    def decode(cls, sim: "Simulation", data):
+        magic, version, tick, points, kills, seed, spawn_timer, enemy_spawn_timer, spawned, count = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError(f"not a version {cls.VERSION} snapshot")
+        data = memoryview(data)
+        sections = {}
+        offset = cls.HEADER.size
+        for _ in range(count):
+            tag, n, size = cls.SECTION.unpack_from(data, offset)
+            offset += cls.SECTION.size
+            sections[tag] = (n, data[offset:offset + size])
+            offset += size
+
+        # before the objects, so enemies coming out of the pool roll their stats in the snapshot's ranges
+        sim.params = decode_params(sections[b"PARM"][1])
+        cls._decode_players(sim, *sections[b"PLYR"])
+        cls._decode_rocks(sim, *sections[b"ROCK"])
+        cls._decode_lasers(sim, *sections[b"LASR"])
+        cls._decode_scrap(sim, *sections[b"SCRP"])
+        cls._decode_enemies(sim, sim.enemies, *sections[b"ENMY"])
+        cls._decode_debris(sim.debris, *sections[b"DEBR"], *sections[b"PALT"])
+        if sim.sector and b"SROK" in sections:
+            cls._decode_sector(sim, sim.sector, sections)
+
+        sim.tick = tick
+        sim.points = points
+        sim.kills = kills
+        sim.seed = seed
+        sim.spawn_timer = spawn_timer
+        sim.enemy_spawn_timer = enemy_spawn_timer
+        # pooled enemies coming back out above drew from the rng, so it has to be restored last
+        sim.enemies_spawned = spawned
+        cls._decode_rng(sim.rng, seed, sections[b"RAND"][1])
+
+    # column-wise, since pulling whole columns out of a structured array is far cheaper than row by row
+    @staticmethod
+    def _rows(dtype, count, payload):
+        records = np.frombuffer(payload, dtype=dtype, count=count)
+        return zip(*(records[name].tolist() for name in dtype.names))
+
+    @staticmethod
+    def _set_body(obj, x, y, vx, vy, facing, hp):
+        obj.phys.place((x, y), (vx, vy), facing)
+        if obj.health:
+            obj.health.hp = hp
+
+    @staticmethod
+    def _resize(objects: list, count, make, pool: "ObjectPool" = None):
+        while len(objects) > count:
+            obj = objects.pop()
+            if pool:
+                pool.release(obj)
+            else:
+                obj.phys.release()
+        while len(objects) < count:
+            objects.append(make())
+
+    # the first player always stays, other ships come and go with the snapshot
+    @classmethod
+    def _decode_players(cls, sim: "Simulation", count, payload):
+        while len(sim.players) > max(1, count):
+            sim.remove_player(sim.players[-1])
+        while len(sim.players) < count:
+            sim.add_player()
+        for player, row in zip(sim.players, cls._rows(cls.PLAYER, count, payload)):
+            cls._set_body(player, *row[:6])
+            player.health.max_hp, player.turn_vel = row[6:]
+
+    @classmethod
+    def _decode_rocks(cls, sim: "Simulation", count, payload):
+        cls._resize(sim.rocks, count, lambda: Rock.blank(sim.physics_world))
+        for rock, row in zip(sim.rocks, cls._rows(cls.ROCK, count, payload)):
+            cls._set_body(rock, *row[:6])
+            rock.health.max_hp, rock.phys.mass, rock.graphics.scale, rock.phys.spin_speed, rock.phys.spin, breaking, rock.break_timer = row[6:]
+            rock.is_breaking = bool(breaking)
+            rock.phys.wrap_radius = rock.graphics.get_radius()
+
+    @classmethod
+    def _decode_lasers(cls, sim: "Simulation", count, payload):
+        cls._resize(sim.lasers, count, lambda: sim.laser_pool.acquire((0, 0), 0), sim.laser_pool)
+        for laser, row in zip(sim.lasers, cls._rows(cls.LASER, count, payload)):
+            cls._set_body(laser, *row[:6])
+            dir_x, dir_y, laser.distance_travelled, owner, colour = row[6:]
+            laser.dir = pygame.Vector2(dir_x, dir_y)
+            laser.set_owner(cls.OWNERS[owner])
+            laser.colour = tuple(colour)
+
+    @classmethod
+    def _decode_scrap(cls, sim: "Simulation", count, payload):
+        cls._resize(sim.scrap, count, lambda: sim.scrap_pool.acquire((0, 0), (0, 0)), sim.scrap_pool)
+        for scrap, row in zip(sim.scrap, cls._rows(cls.SCRAP, count, payload)):
+            cls._set_body(scrap, *row[:6])
+            scrap.point_value, scrap.timer, scrap.age = row[6:]
+
+    @classmethod
+    def _decode_enemies(cls, sim: "Simulation", enemies: list, count, payload):
+        cls._resize(enemies, count, lambda: sim.enemy_pool.acquire((0, 0), sim), sim.enemy_pool)
+        for e, row in zip(enemies, cls._rows(cls.ENEMY, count, payload)):
+            cls._set_body(e, *row[:6])
+            (e.turn_vel, e.max_speed, e.thrust, e.max_turn_speed,
+             e.accuracy, e.aggression, e.bravery, e.preferred_range, e.fire_range,
+             e.fire_cooldown_base, e.fire_cooldown, state, e.wander_timer, e.wander_dir,
+             e.player_dist, e.desired_angle, move, can_fire, sep_x, sep_y,
+             e.next_think, e.think_slot, e.strafe_dir) = row[6:]
+            e.state = cls.STATES[state]
+            e.move = cls.MOVES[move]
+            e.can_fire = bool(can_fire)
+            e.separation = pygame.Vector2(sep_x, sep_y)
+            e.phys.max_speed = e.max_speed
+
+    @classmethod
+    def _decode_sector(cls, sim: "Simulation", sector: "Sector", sections):
+        sector.clear(sim)
+        sector.bounds = sector.awake_bounds(sim.player.phys.pos)
+        count, payload = sections.get(b"SROK", (0, b""))
+        sector._reserve(count)
+        offset = 0
+        for arr in sector._arrays():
+            size = count * arr[0].size * arr.itemsize
+            arr[:count] = np.frombuffer(payload[offset:offset + size], dtype=arr.dtype).reshape((count,) + arr.shape[1:])
+            offset += size
+        sector.rock_count = count
+        enemies = []
+        cls._decode_enemies(sim, enemies, *sections.get(b"SENM", (0, b"")))
+        for e in enemies:
+            sector.sleep_enemy(e)
+
+    @staticmethod
+    def _decode_debris(debris: "ParticleSystem", count, payload, colours, palette):
+        debris.clear()
+        debris._reserve(count)
+        offset = 0
+        for arr in debris._arrays():
+            size = count * arr[0].size * arr.itemsize
+            arr[:count] = np.frombuffer(payload[offset:offset + size], dtype=arr.dtype).reshape((count,) + arr.shape[1:])
+            offset += size
+        debris.count = count
+
+        # stamps are stored in palette order, so they only survive if the palette still starts the same way
+        old = list(debris.palette)
+        new = [tuple(palette[i*3:i*3 + 3]) for i in range(colours)]
+        if new[:len(old)] != old:
+            debris.stamps = []
+        debris.palette = {colour: i for i, colour in enumerate(new)}
+
+    @classmethod
+    def _decode_rng(cls, rng: "GameRandom", seed, payload):
+        rng.master_seed = seed
+        offset = 0
+        for name in GameRandom.STREAMS:
+            words = array.array("I")
+            words.frombytes(payload[offset:offset + 625 * 4])
+            offset += 625 * 4
+            has_gauss, gauss = struct.unpack_from("<?d", payload, offset)
+            offset += struct.calcsize("<?d")
+            getattr(rng, name).setstate((3, tuple(words), gauss if has_gauss else None))
+        state, inc, has_uint32, uinteger = cls.PCG64.unpack_from(payload, offset)
+        rng.particles.bit_generator.state = {
+            "bit_generator": "PCG64",
+            "state": {"state": int.from_bytes(state, "little"), "inc": int.from_bytes(inc, "little")},
+            "has_uint32": has_uint32,
+            "uinteger": uinteger,
+        }
+
+    @classmethod
+    def save(cls, sim: "Simulation", path):
+        with open(path, "wb") as f:
+            f.write(cls.encode(sim))
+
+    @classmethod
+    def load(cls, sim: "Simulation", path):
+        with open(path, "rb") as f:
+            cls.decode(sim, f.read())
+
+# the last REWIND_DEPTH snapshots, one every REWIND_INTERVAL ticks - older ones fall off the back
+class SnapshotRing:
+    def __init__(self, interval=REWIND_INTERVAL, depth=REWIND_DEPTH):
+        self.interval = interval
+        self.snapshots = deque(maxlen=depth)
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def capture(self, sim: "Simulation"):
+        if sim.tick % self.interval == 0:
+            self.snapshots.append(Snapshot.encode(sim))
+
+    # steps back to the newest snapshot and drops it, so holding rewind keeps going further back
+    def rewind(self, sim: "Simulation"):
+        if not self.snapshots:
+            return False
+        Snapshot.decode(sim, self.snapshots.pop())
+        return True
+
+    def clear(self):
+        self.snapshots.clear()
+
+### --- SIM PROCESS --- ###
+# --split: the simulation ticks in a child process while this one only reads the keyboard and draws, so the two
+# overlap on separate cores and a slow frame on one side doesn't hold up the other. each tick's snapshot is
+# published into shared memory, and inputs go back the other way down a pipe
+
+# two snapshot slots behind a few int64 control words. the writer only ever fills the slot that isn't the newest,
+# and bumps that slot's sequence number before and after - odd while it's mid-write. the reader copies a slot out
+# and only keeps the copy if the sequence was even and hadn't moved by the end, otherwise it goes again. nothing
+# waits on anything, and the reader never stores to the control words, so there's no store-then-load to reorder
+class SharedWorld:
+    LATEST, PUBLISHED, SIZES, SEQUENCES = 0, 1, 2, 4   # SIZES + i and SEQUENCES + i are slot i's length and sequence
+    CONTROL_BYTES = 64
+
+    def __init__(self, name=None, slot_bytes=SHARED_SLOT_BYTES):
+        create = name is None
+        self.memory = shared_memory.SharedMemory(name, create=create, size=self.CONTROL_BYTES + 2 * slot_bytes if create else 0)
+        self.name = self.memory.name
+        self.slot_bytes = slot_bytes
+        self.control = np.ndarray(self.CONTROL_BYTES // 8, dtype=np.int64, buffer=self.memory.buf)
+        if create:
+            self.control[:] = 0
+            self.control[self.LATEST] = -1
+        self.seen = 0
+
+    def slot(self, index, size):
+        start = self.CONTROL_BYTES + index * self.slot_bytes
+        return self.memory.buf[start:start + size]
+
+    # writer side
+    def publish(self, blob):
+        if len(blob) > self.slot_bytes:
+            raise ValueError(f"a {len(blob)} byte snapshot doesn't fit in a {self.slot_bytes} byte slot (see SHARED_SLOT_BYTES)")
+        control = self.control
+        index = 1 if control[self.LATEST] == 0 else 0
+        control[self.SEQUENCES + index] += 1
+        self.slot(index, len(blob))[:] = blob
+        control[self.SIZES + index] = len(blob)
+        control[self.SEQUENCES + index] += 1
+        control[self.LATEST] = index
+        control[self.PUBLISHED] += 1
+
+    # reader side - decodes the newest snapshot into sim, if it hasn't seen it already. the writer can lap a slow
+    # copy, so it's checked before anything gets decoded from it
+    def read(self, sim: "Simulation"):
+        control = self.control
+        while True:
+            published = int(control[self.PUBLISHED])
+            if published == self.seen:
+                return False
+            index = int(control[self.LATEST])
+            sequence = int(control[self.SEQUENCES + index])
+            if sequence % 2:
+                continue
+            blob = bytes(self.slot(index, int(control[self.SIZES + index])))
+            if control[self.SEQUENCES + index] == sequence:
+                break
+        Snapshot.decode(sim, blob)
+        self.seen = published
+        return True
+
+    def close(self, unlink=False):
+        # the numpy view has to go before the mapping can be closed
+        self.control = None
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+# the child process - a headless simulation ticking in real time. messages from the window are
+# (Inputs, rewinding, commands), and only arrive when something changed
+def run_simulation(name, conn, config):
+    global PHYSICS_WORLD, WORLD_WIDTH, WORLD_HEIGHT
+    # a spawned process starts from a fresh import, so whatever the command line set has to be passed over
+    PHYSICS_WORLD = config["physics_world"]
+    WORLD_WIDTH, WORLD_HEIGHT = config["world"]
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pygame.init()
+
+    sim = Simulation(config["seed"])
+    if config["load"]:
+        Snapshot.load(sim, config["load"])
+    if config["record"]:
+        sim.recorder = InputLog(sim.seed, params=sim.params)
+    rewind = SnapshotRing()
+    shared = SharedWorld(name)
+    inputs = Inputs()
+    rewinding = fire = False
+    unpublished = True
+    next_tick = time.perf_counter()
+    try:
+        while True:
+            # sleep until the next tick is due, waking early for anything the window sends
+            while conn.poll(max(0.0, next_tick - time.perf_counter())):
+                inputs, rewinding, commands = conn.recv()
+                fire = fire or inputs.fire
+                for command in commands:
+                    if command == "quit":
+                        return
+                    if command == "save":
+                        Snapshot.save(sim, QUICKSAVE_PATH)
+                    if command == "load" and os.path.exists(QUICKSAVE_PATH) and sim.recorder is None:
+                        Snapshot.load(sim, QUICKSAVE_PATH)
+                        rewind.clear()
+                        unpublished = True
+
+            # same rules as GameCtrl.main_loop - a held-over shot, no rewinding while recording, backlog dropped
+            steps = 0
+            while next_tick <= time.perf_counter() and steps < MAX_CATCHUP_STEPS:
+                if rewinding and sim.recorder is None:
+                    rewind.rewind(sim)
+                else:
+                    inputs.fire = fire
+                    fire = False
+                    sim.step(inputs)
+                    rewind.capture(sim)
+                next_tick += SIM_DT
+                steps += 1
+                unpublished = True
+            if steps == MAX_CATCHUP_STEPS:
+                next_tick = max(next_tick, time.perf_counter())
+
+            if unpublished:
+                shared.publish(Snapshot.encode(sim, sleeping=False))
+                unpublished = False
+    except EOFError:
+        pass  # the window went away without saying goodbye
+    finally:
+        if sim.recorder is not None:
+            sim.recorder.save(config["record"])
+        shared.close()
+
+# the window's end of --split: owns the shared memory, starts the simulation process and talks to it
+class SimProcess:
+    def __init__(self, seed, load=None, record=None):
+        self.shared = SharedWorld()
+        # spawn rather than fork, so the child doesn't inherit this process's display and audio
+        context = multiprocessing.get_context("spawn")
+        reader, self.conn = context.Pipe(duplex=False)
+        config = {"seed": seed, "load": load, "record": record, "physics_world": PHYSICS_WORLD, "world": (WORLD_WIDTH, WORLD_HEIGHT)}
+        self.process = context.Process(target=run_simulation, args=(self.shared.name, reader, config), daemon=True)
+        self.process.start()
+        reader.close()
+        self.commands = []
+        self.last_sent = None
+
+    # held keys only get sent when they change - shots and commands always go straight away
+    def send(self, inputs: Inputs, rewinding):
+        key = (inputs.to_bits(), rewinding)
+        if key == self.last_sent and not self.commands:
+            return
+        self.conn.send((inputs, rewinding, self.commands))
+        self.last_sent = key
+        self.commands = []
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def stop(self):
+        if self.process.is_alive():
+            self.conn.send((Inputs(), False, ["quit"]))
+            self.process.join(timeout=5)
+        self.conn.close()
+        self.shared.close(unlink=True)
+
+### --- FRAME GOVERNOR --- ###
+# keeps frames inside FRAME_BUDGET by shedding the work that's missed least. the time each phase of a frame takes
+# ("sim", "draw") feeds a smoothed average - once frames have run over budget for a while, the next step for the
+# heaviest phase gets taken, and once there's been plenty of headroom for a while the newest step is put back.
+# a phase can be frozen: sim steps change the simulation, so they're off while recording or when it runs elsewhere
+class FrameGovernor:
+    # cheapest to lose first, as (knob, phase it relieves, setting)
+    STEPS = [
+        ("health_bars", "draw", False),
+        ("debris", "sim", 0.5),
+        ("sprite_angles", "draw", 6),
+        ("ai", "sim", 2),
+        ("debris", "sim", 0.25),
+        ("sprite_angles", "draw", 12),
+        ("ai", "sim", 4),
+    ]
+
+    def __init__(self, game: "Simulation", budget=None):
+        self.game = game
+        self.budget = FRAME_BUDGET if budget is None else budget
+        self.frozen = set()
+        self.taken = []     # (step, the setting it replaced), newest last
+        self.averages = {}
+        self.over = 0
+        self.under = 0
+        self.frame = 0
+        self.log = deque(maxlen=64)
+        self.stream = None
+
+    def settings(self):
+        return {"health_bars": health_bars.enabled, "debris": self.game.debris.density,
+                "sprite_angles": sprite_cache.angle_step, "ai": self.game.ai.interval_scale}
+
+    def apply(self, knob, setting):
+        if knob == "health_bars":
+            health_bars.enabled = setting
+        elif knob == "debris":
+            self.game.debris.density = setting
+        elif knob == "sprite_angles":
+            sprite_cache.set_angle_step(setting)
+        elif knob == "ai":
+            self.game.ai.interval_scale = setting
+
+    def freeze(self, phase):
+        self.frozen.add(phase)
+
+    def level(self):
+        return len(self.taken)
+
+    # times maps each phase to the seconds it took this frame
+    def update(self, times):
+        self.frame += 1
+        for phase, seconds in times.items():
+            average = self.averages.get(phase, seconds)
+            self.averages[phase] = average + (seconds - average) * GOVERNOR_SMOOTHING
+        total = sum(self.averages.values())
+        if total > self.budget:
+            self.over += 1
+            self.under = 0
+        elif total < self.budget * GOVERNOR_HEADROOM:
+            self.under += 1
+            self.over = 0
+        else:
+            self.over = self.under = 0
+
+        if self.over >= GOVERNOR_SHED_FRAMES:
+            self.shed()
+        elif self.under >= GOVERNOR_RESTORE_FRAMES and self.taken:
+            self.restore()
+
+    # the next step for the heaviest phase, or for any phase if that one has none left
+    def shed(self):
+        self.over = 0
+        taken = {step for step, _ in self.taken}
+        steps = [i for i, (_, phase, _) in enumerate(self.STEPS) if i not in taken and phase not in self.frozen]
+        if not steps:
+            return
+        heaviest = max(self.averages, key=self.averages.get)
+        step = next((i for i in steps if self.STEPS[i][1] == heaviest), steps[0])
+        knob, _, setting = self.STEPS[step]
+        self.taken.append((step, self.settings()[knob]))
+        self.apply(knob, setting)
+        self.record("shed", knob, setting)
+
+    def restore(self):
+        self.under = 0
+        step, previous = self.taken.pop()
+        knob = self.STEPS[step][0]
+        self.apply(knob, previous)
+        self.record("restore", knob, previous)
+
+    # back to full quality, e.g. before another world takes over the shared caches
+    def reset(self):
+        while self.taken:
+            self.restore()
+
+    # every step is kept for the profiler overlay, and streamed as JSON lines if there's a log open
+    def record(self, action, knob, setting):
+        entry = {"frame": self.frame, "action": action, "knob": knob, "setting": setting, "level": len(self.taken)}
+        entry.update({f"{phase}_ms": round(seconds * 1000, 3) for phase, seconds in self.averages.items()})
+        self.log.append(entry)
+        if self.stream:
+            self.stream.write(json.dumps(entry) + "\n")
+            self.stream.flush()
+
+    def open_log(self, path):
+        self.close_log()
+        self.stream = open(path, "w")
+
+    def close_log(self):
+        if self.stream:
+            self.stream.close()
+        self.stream = None
+
+### --- GAME CONTROL --- ###
+class GameCtrl(Simulation):
+    def __init__(self, seed=None):
+        pygame.init()
+        # the window comes first so every asset gets converted to its format as it's collected
+        self.window = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+        self.game_font = pygame.font.SysFont("Lucida Sans", 24)
+        self.clock = pygame.time.Clock()
+        self.load_assets()
+        super().__init__(seed)
+        self.background = Background()
+        self.render = RenderQueue()
+        self.render_stats = {}
+        self.last_offset = None
+        self.dirty = []
+        self.show_profiler = False
+        self.profiler_font = pygame.font.SysFont("monospace", 14)
+        self.profiler_overlay = None
+
+        self.record_path = None
+        self.rewind = SnapshotRing()
+        self.sim_process = None
+        self.governor = FrameGovernor(self) if FRAME_GOVERNOR else None
+        self.hud = Hud(self.game_font)
+        self.hud.add("points", (16,16))
+        self.hud.add("hp", (WINDOW_WIDTH // 2, WINDOW_HEIGHT - 30), anchor="midbottom")
+        if PREBAKE_SPRITES:
+            self.prebake_sprites()
+
+    # loading screen - the asset threads decode everything while this keeps the window responsive
+    def load_assets(self):
+        assets.preload("image", SPRITE_ASSETS)
+        assets.preload("pixels", [path for path, _ in BACKGROUND_LAYERS])
+        bar = pygame.Rect(0, 0, 400, 12)
+        bar.center = (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 30)
+        label = self.game_font.render("Loading...", True, (255,255,255))
+        while not assets.ready():
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    exit()
+            done, total = assets.progress()
+            self.window.fill((0,0,0))
+            self.window.blit(label, label.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)))
+            pygame.draw.rect(self.window, (80,80,80), bar, 1)
+            pygame.draw.rect(self.window, (80,220,255), (bar.x, bar.y, bar.width * done // max(1, total), bar.height))
+            pygame.display.flip()
+            self.clock.tick(60)
+        assets.wait()
+
+    # rocks get their scale from their mass (0.5 - 1.5), enemies are always drawn at 0.9
+    def prebake_sprites(self):
+        step = sprite_cache.scale_step
+        rock_scales = [step * i for i in range(round(0.5 / step), round(1.5 / step) + 1)]
+        sprite_cache.prebake("asteroid.png", assets.image("asteroid.png"), rock_scales)
+        sprite_cache.prebake("enemyship.png", assets.image("enemyship.png"), [0.9])
+        sprite_cache.reset_stats()
+
+    # fixed-step simulation, free-running render. if the ticks can't keep up the backlog is dropped,
+    # so a heavy scene lowers the frame rate rather than slowing the game down (until it can't even manage 60 ticks/s)
+    def main_loop(self):
+        accumulator = 0.0
+        previous = time.perf_counter()
+        fire = False
+        while True:
+            frame_start = time.perf_counter()
+            accumulator += frame_start - previous
+            previous = frame_start
+
+            inputs = self.check_events()
+            fire = fire or inputs.fire
+            # an input log can't represent going backwards, so there's no rewinding while recording
+            rewinding = pygame.key.get_pressed()[pygame.K_BACKSPACE] and self.recorder is None
+            sim_start = time.perf_counter()
+            steps = 0
+            while accumulator >= SIM_DT and steps < MAX_CATCHUP_STEPS:
+                if rewinding:
+                    self.rewind.rewind(self)
+                else:
+                    # a shot only goes out on the first tick, and is held over if this frame doesn't tick at all
+                    inputs.fire = fire
+                    fire = False
+                    self.step(inputs)
+                    self.rewind.capture(self)
+                accumulator -= SIM_DT
+                steps += 1
+            if steps == MAX_CATCHUP_STEPS:
+                accumulator = min(accumulator, SIM_DT)
+
+            draw_start = time.perf_counter()
+            self.draw_window(accumulator / SIM_DT)
+            frame_time = time.perf_counter() - frame_start
+            if self.governor:
+                self.governor.update({"sim": draw_start - sim_start, "draw": time.perf_counter() - draw_start})
+            self.clock.tick(RENDER_FPS)
+            profiler.end_frame(frame_time, self.entity_counts(), self.clock.get_fps())
+
+    # --split - from here on this world is only a copy of the simulation process's newest tick, for drawing
+    def start_sim_process(self, load=None, record=None):
+        self.sim_process = SimProcess(self.seed, load, record)
+        if self.governor:
+            self.governor.freeze("sim")
+        if self.sector:
+            # sleepers never get drawn, and the real ones are over there
+            self.sector.clear(self)
+
+    # the simulation process keeps its own time, so each frame just sends the inputs over and draws
+    # whichever tick is newest - there's nothing to interpolate between, and no point redrawing the same tick
+    def split_loop(self):
+        link = self.sim_process
+        while True:
+            frame_start = time.perf_counter()
+            inputs = self.check_events()
+            link.send(inputs, pygame.key.get_pressed()[pygame.K_BACKSPACE])
+            if not link.alive():
+                self.quit()
+            if self.sync_world():
+                self.draw_window()
+            frame_time = time.perf_counter() - frame_start
+            if self.governor:
+                self.governor.update({"draw": frame_time})
+            self.clock.tick(RENDER_FPS)
+            profiler.end_frame(frame_time, self.entity_counts(), self.clock.get_fps())
+
+    # this world becomes a copy of the simulation process's newest tick, minus anything asleep
+    @profiler.timed("sync_world")
+    def sync_world(self):
+        return self.sim_process.shared.read(self)
+
+    def quit(self):
+        if self.sim_process is not None:
+            self.sim_process.stop()
+        if self.recorder is not None and self.record_path:
+            self.recorder.save(self.record_path)
+        profiler.close_stream()
+        if self.governor:
+            self.governor.close_log()
+        exit()
+
+    # a replay runs without a governor, so nothing that changes the simulation can be shed while recording
+    def start_recording(self, path):
+        self.recorder = InputLog(self.seed, params=self.params)
+        self.record_path = path
+        if self.governor:
+            self.governor.freeze("sim")
+
+    # turn this frame's events and held keys into the inputs for the next tick
+    def check_events(self):
+        fire = False
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.quit()
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    fire = True
+                if event.key == pygame.K_F3:
+                    self.toggle_profiler()
+                if event.key == pygame.K_F5:
+                    self.quicksave()
+                if event.key == pygame.K_F9:
+                    self.quickload()
+        return Inputs.from_keys(pygame.key.get_pressed(), fire)
+
+    # with --split the real world lives in the simulation process, so that's where saving and loading happen
+    def quicksave(self):
+        if self.sim_process is not None:
+            self.sim_process.commands.append("save")
+        else:
+            Snapshot.save(self, QUICKSAVE_PATH)
+
+    def quickload(self):
+        if self.sim_process is not None:
+            self.sim_process.commands.append("load")
+        elif os.path.exists(QUICKSAVE_PATH) and self.recorder is None:
+            Snapshot.load(self, QUICKSAVE_PATH)
+            self.rewind.clear()
+
+    @profiler.timed("draw_window")
+    def draw_window(self, alpha=1.0):
+        # the camera follows the player, and the background parallaxes off the player's position
+        focus = self.player.phys.draw_pos(alpha)
+        self.render.origin = camera_origin(focus)
+        offsets = (self.render.origin, self.background.offsets(focus))
+        full_redraw = not DIRTY_RECTS or offsets != self.last_offset
+        if full_redraw:
+            bg_calls, bg_blits = self.background.draw(self.window, offsets[1])
+        else:
+            # nothing has scrolled - only paint the background back over whatever was drawn last frame
+            bg_calls = bg_blits = 0
+            for rect in self.dirty:
+                calls, blits = self.background.draw(self.window, offsets[1], rect)
+                bg_calls += calls
+                bg_blits += blits
+
+        # draw all existing game objects - keeping the layer order sensible (e.g. scrap below rocks)
+        origin = self.render.origin
+        for laser in self.in_view(self.lasers, origin):
+            laser.draw(self.render, alpha)
+        for player in self.players:
+            player.draw(self.render, alpha)
+        for enemy in self.in_view(self.enemies, origin):
+            enemy.draw(self.render, alpha)
+        for scrap in self.in_view(self.scrap, origin):
+            scrap.draw(self.render, alpha)
+        for rock in self.in_view(self.rocks, origin):
+            rock.draw(self.render, alpha)
+        self.debris.draw(self.render, alpha)
 
         self.draw_text()
 
-        pygame.display.flip()
+        rects = self.render.flush(self.window, dirty=DIRTY_RECTS)
+        self.render_stats = dict(self.render.stats)
+        self.render_stats["draw_calls"] += bg_calls
+        self.render_stats["blits"] += bg_blits
 
-    # draw all in-game text
+        if full_redraw:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.dirty + rects)
+        self.dirty = rects
+        self.last_offset = offsets
+
+    # a big world's awake chunks reach well past the window, so anything that can't be on screen is skipped before
+    # it even gets to the sprite cache. pad covers the biggest sprite and its health bar
+    def in_view(self, objects, origin, pad=128):
+        if self.sector is None or not objects:
+            return objects
+        x, y = (body_positions(objects) - origin).T
+        seen = (x > -pad) & (x < WINDOW_WIDTH + pad) & (y > -pad) & (y < WINDOW_HEIGHT + pad)
+        return [obj for obj, visible in zip(objects, seen.tolist()) if visible]
+
+    # draw all in-game text - the HUD only re-renders what actually changed
     def draw_text(self):
         # points display
-        points_text = self.game_font.render(f"Points: {self.points}", True, (255,255,255))
-        self.window.blit(points_text, (16,16))
+        self.hud.set_text("points", f"Points: {self.points}")
 
         # player hp
-        hp_text = self.game_font.render(f"{self.player.health}", True, (255,255,255))
-        hp_x = WINDOW_WIDTH // 2 - hp_text.get_width() // 2
-        hp_y = WINDOW_HEIGHT - hp_text.get_height() - 30
-        self.window.blit(hp_text, (hp_x, hp_y))
+        self.hud.set_text("hp", f"{self.player.health}")
+
+        if self.show_profiler:
+            self.draw_profiler()
+
+        self.hud.draw(self.render)
+
+    # F3 - the overlay needs the profiler running, a stream keeps it running after the overlay is closed
+    def toggle_profiler(self):
+        self.show_profiler = not self.show_profiler
+        profiler.enabled = self.show_profiler or profiler.stream is not None
+        self.profiler_overlay = None
+        if self.show_profiler:
+            self.hud.add("profiler", (WINDOW_WIDTH - 16, 16), anchor="topright")
+        else:
+            self.hud.remove("profiler")
+
+    # rolling averages, refreshed a few times a second so the overlay itself stays cheap
+    def draw_profiler(self):
+        if self.profiler_overlay is None or profiler.frame % 15 == 0:
+            avg = profiler.averages()
+            lines = [
+                f"frame {avg.get('frame_ms', 0):6.2f} ms  max {max((s['frame_ms'] for s in profiler.history), default=0):6.2f}",
+                f"fps   {avg.get('fps', 0):6.1f}",
+            ]
+            lines += [f"{name:<24}{avg.get(name, 0):6.2f} ms" for name in profiler.names]
+            lines += [f"{name:<24}{avg.get(name, 0):6.0f}" for name in self.entity_counts()]
+            if self.governor:
+                lines.append(f"{'governor level':<24}{self.governor.level():6}")
+
+            line_height = self.profiler_font.get_linesize()
+            graph_height = 40
+            width = 300
+            overlay = pygame.Surface((width, line_height * len(lines) + graph_height + 16), pygame.SRCALPHA)
+            overlay.fill((0, 0, 0, 160))
+            for i, line in enumerate(lines):
+                overlay.blit(self.profiler_font.render(line, True, (220,220,220)), (8, 4 + i * line_height))
+
+            # fps trend, 0 at the bottom and 60 at the top
+            fps = [s["fps"] for s in profiler.history]
+            if len(fps) > 1:
+                top = line_height * len(lines) + 8
+                step = (width - 16) / (profiler.history.maxlen - 1)
+                points = [(8 + i * step, top + graph_height - min(60, f) / 60 * graph_height) for i, f in enumerate(fps)]
+                pygame.draw.lines(overlay, (0,220,0), False, points)
+            self.profiler_overlay = overlay
+
+        self.hud.set_image("profiler", self.profiler_overlay)
 
 if __name__ == "__main__":
-    GameCtrl()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--headless", type=int, metavar="TICKS", help="run TICKS ticks with no window and report the tick rate")
+    parser.add_argument("--profile-out", metavar="PATH", help="stream per-frame profiler samples to a .csv or .jsonl file")
+    parser.add_argument("--seed", type=int, help="world seed (random if not given)")
+    parser.add_argument("--record", metavar="PATH", help="record this session's inputs for --replay")
+    parser.add_argument("--replay", metavar="PATH", help="re-run a recorded session headless at full speed and check it still matches")
+    parser.add_argument("--assets", action="store_true", help="load every asset, print what each one costs in memory and exit")
+    parser.add_argument("--memory", type=int, metavar="COUNT", help="build COUNT of every entity type, print what each one costs and exit")
+    parser.add_argument("--physics-world", action="store_true", help="integrate physics in one vectorized pass (see PHYSICS_WORLD)")
+    parser.add_argument("--split", action="store_true", help="run the simulation in a second process and only draw in this one")
+    parser.add_argument("--world", metavar="WIDTHxHEIGHT", help="play in a scrolling world this big instead of a single screen")
+    parser.add_argument("--load", metavar="PATH", help="start from a saved snapshot instead of a fresh world")
+    parser.add_argument("--checkpoint", metavar="PATH", help="save a snapshot of the world at the end of a --headless run")
+    parser.add_argument("--no-governor", action="store_true", help="never shed work when frames run over budget")
+    parser.add_argument("--governor-log", metavar="PATH", help="log every step the frame governor takes to a .jsonl file")
+    args = parser.parse_args()
+
+    if args.physics_world:
+        PHYSICS_WORLD = True
+    if args.no_governor:
+        FRAME_GOVERNOR = False
+    if args.world:
+        try:
+            WORLD_WIDTH, WORLD_HEIGHT = (max(int(n), size) for n, size in zip(args.world.lower().split("x"), (WINDOW_WIDTH, WINDOW_HEIGHT)))
+        except ValueError:
+            parser.error("--world takes WIDTHxHEIGHT, e.g. 40960x40960")
+
+    if args.load and args.record:
+        parser.error("--record has to start from a fresh world, not a --load snapshot")
+
+    if args.headless or args.replay:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        pygame.init()
+
+    if args.assets:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        pygame.init()
+        pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+        start = time.perf_counter()
+        assets.preload("image", SPRITE_ASSETS)
+        assets.preload("pixels", [path for path, _ in BACKGROUND_LAYERS])
+        assets.wait()
+        print(assets.report())
+        print(f"loaded in {(time.perf_counter() - start) * 1000:.1f} ms on {assets.threads} threads")
+    elif args.memory:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        pygame.init()
+        pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+        print(format_memory(measure_memory(args.memory, args.seed or 0)))
+    elif args.replay:
+        try:
+            log = InputLog.load(args.replay)
+        except ValueError as e:
+            print(e)
+            exit(1)
+        print(f"replaying {log.world[0]}x{log.world[1]}" + (" with the physics world" if log.physics_world else ""))
+        start = time.perf_counter()
+        diverged = log.replay()
+        elapsed = time.perf_counter() - start
+        print(f"{len(log)} ticks in {elapsed:.2f}s ({len(log) / elapsed:.0f} ticks/s)")
+        if diverged is not None:
+            print(f"replay diverged at tick {diverged}")
+            exit(1)
+        print("replay matches the recording")
+    elif args.headless:
+        sim = Simulation(args.seed)
+        if args.load:
+            Snapshot.load(sim, args.load)
+        if args.record:
+            sim.recorder = InputLog(sim.seed, params=sim.params)
+        start = time.perf_counter()
+        sim.run(args.headless)
+        elapsed = time.perf_counter() - start
+        print(f"{args.headless} ticks in {elapsed:.2f}s ({args.headless / elapsed:.0f} ticks/s)")
+        if args.record:
+            sim.recorder.save(args.record)
+        if args.checkpoint:
+            Snapshot.save(sim, args.checkpoint)
+    else:
+        game = GameCtrl(args.seed)
+        if args.split:
+            # loading and recording both happen on the simulation's side
+            game.start_sim_process(args.load, args.record)
+        else:
+            if args.load:
+                Snapshot.load(game, args.load)
+            if args.record:
+                game.start_recording(args.record)
+        if args.profile_out:
+            profiler.open_stream(args.profile_out, game.entity_counts())
+        if args.governor_log and game.governor:
+            game.governor.open_log(args.governor_log)
+        if args.split:
+            game.split_loop()
+        else:
+            game.main_loop()
@@ -0,0 +1,725 @@
+# Networked multiplayer - one authoritative server runs the Simulation and every other ship in it belongs to a
+# remote client. clients only ever send their controls. the server sends the world back SEND_INTERVAL ticks apart,
+# quantised to a few bytes an object and delta-compressed against the last snapshot each client acknowledged, over UDP.
+#
+#   python net.py --serve                                  host a game on NET_PORT and play in it
+#   python net.py --serve --headless                       dedicated server - the first client to join gets the host's ship
+#   python net.py --connect 192.168.1.5                    join a game
+#   python net.py --loopback 16 --latency 0.08 --loss 0.05 a server and 16 bot clients over localhost, then a bandwidth report
+#
+# --latency, --jitter and --loss put a shim on every socket that holds back and drops what it sends, for testing
+# over localhost. latency is one way, so the round trip is twice that
+
+import argparse
+import heapq
+import itertools
+import json
+import os
+import random
+import socket
+import struct
+import time
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+import pygame
+
+import main
+
+NET_PORT = 7777
+SEND_INTERVAL = 3           # ticks between snapshots - 20 a second at 60 ticks a second
+HISTORY = 64                # snapshots both ends keep around for deltas to be taken against
+CLIENT_TIMEOUT = 5.0        # seconds of silence before a client's ship is dropped
+KEEPALIVE = 0.1             # clients send their controls at least this often, even when nothing has changed
+JOIN_RETRY = 0.25
+POS_SCALE = 4               # positions go out in quarter pixels, which is plenty inside a single-screen world
+MAX_DATAGRAM = 65507
+
+JOIN, WELCOME, INPUT, SNAP, LEAVE = range(1, 6)
+PACKET_TYPE = struct.Struct("<B")
+WELCOME_PACKET = struct.Struct("<BH")       # type, net id of the client's ship
+INPUT_PACKET = struct.Struct("<BHIHB")      # type, input sequence, newest snapshot received, shots fired so far, held controls
+SNAP_PACKET = struct.Struct("<BIIIi")       # type, sequence, baseline it's a delta against (0 = none), tick, points
+KIND_HEADER = struct.Struct("<HH")          # objects changed, objects removed
+FIRE_BIT = 1 << main.Inputs.FIELDS.index("fire")
+
+# one quantised record per object and kind. everything after the id is a field a delta can leave out -
+# velocities never go out, clients only interpolate between the positions they're sent. lasers fly straight at
+# a constant speed, so they go out as where and when they were fired, which never changes, and a finer facing
+BODY = [("id", "<u2"), ("x", "<i2"), ("y", "<i2"), ("facing", "u1")]
+KINDS = {
+    "players": np.dtype(BODY + [("hp", "u1")]),
+    "rocks": np.dtype(BODY + [("scale", "u1"), ("breaking", "u1")]),
+    "enemies": np.dtype(BODY + [("hp", "u1")]),
+    "lasers": np.dtype(BODY[:3] + [("facing", "<u2"), ("owner", "u1"), ("born", "<u2")]),
+    "scrap": np.dtype(BODY),
+}
+OWNERS = ("player", "enemy")
+
+
+### --- WIRE FORMAT --- ###
+# which of ids are in sorted_ids - np.isin sorts both sides every time, which dominates at these sizes
+def contains(sorted_ids, ids):
+    if not len(sorted_ids):
+        return np.zeros(len(ids), dtype=bool)
+    return sorted_ids[np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)] == ids
+
+# a kind's delta: the ids that went away, then every object that's new or changed with a bitmask of which fields
+# it carries, then each field's values column by column for just the objects that have that bit set.
+# an object the baseline doesn't have carries every field
+def encode_kind(dtype: np.dtype, base: np.ndarray, cur: np.ndarray):
+    fields = dtype.names[1:]
+    mask = np.full(len(cur), (1 << len(fields)) - 1, dtype=np.uint8)
+    if len(base):
+        idx = np.minimum(np.searchsorted(base["id"], cur["id"]), len(base) - 1)
+        matched = base[idx]
+        found = matched["id"] == cur["id"]
+        mask[found] = 0
+        for bit, name in enumerate(fields):
+            mask |= ((matched[name] != cur[name]) & found).astype(np.uint8) << np.uint8(bit)
+    removed = base["id"][~contains(cur["id"], base["id"])]
+    changed = mask != 0
+    rows = cur[changed]
+    masks = mask[changed]
+    parts = [KIND_HEADER.pack(len(rows), len(removed)), removed.tobytes(), rows["id"].tobytes(), masks.tobytes()]
+    for bit, name in enumerate(fields):
+        parts.append(rows[name][(masks >> bit) & 1 == 1].tobytes())
+    return b"".join(parts)
+
+# the baseline with the delta applied, sorted by id, and where the next kind starts
+def decode_kind(dtype: np.dtype, base: np.ndarray, data, offset):
+    changed, removed = KIND_HEADER.unpack_from(data, offset)
+    offset += KIND_HEADER.size
+    gone = np.frombuffer(data, dtype="<u2", count=removed, offset=offset)
+    offset += gone.nbytes
+    ids = np.frombuffer(data, dtype="<u2", count=changed, offset=offset)
+    offset += ids.nbytes
+    masks = np.frombuffer(data, dtype=np.uint8, count=changed, offset=offset)
+    offset += masks.nbytes
+
+    state = base[~contains(gone, base["id"])]
+    fresh = ~contains(state["id"], ids)
+    if fresh.any():
+        new = np.zeros(np.count_nonzero(fresh), dtype=dtype)
+        new["id"] = ids[fresh]
+        state = np.concatenate((state, new))
+        state = state[np.argsort(state["id"], kind="stable")]
+    idx = np.searchsorted(state["id"], ids)
+    for bit, name in enumerate(dtype.names[1:]):
+        has = (masks >> bit) & 1 == 1
+        values = np.frombuffer(data, dtype=dtype[name], count=np.count_nonzero(has), offset=offset)
+        offset += values.nbytes
+        state[name][idx[has]] = values
+    return state, offset
+
+
+### --- LINK --- ###
+# a non-blocking UDP socket, plus a shim that can hold back, jitter and drop whatever goes out of it
+class Link:
+    def __init__(self, address=("0.0.0.0", 0), latency=0.0, jitter=0.0, loss=0.0, seed=0):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(address)
+        self.sock.setblocking(False)
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.queue = []
+        self.order = itertools.count()
+        self.sent = 0
+        self.dropped = 0
+
+    @property
+    def address(self):
+        return self.sock.getsockname()
+
+    def send(self, data, address):
+        self.sent += 1
+        if self.loss and self.random.random() < self.loss:
+            self.dropped += 1
+            return
+        if not self.latency and not self.jitter:
+            self._sendto(data, address)
+            return
+        delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+        heapq.heappush(self.queue, (time.perf_counter() + delay, next(self.order), data, address))
+
+    # sends whatever the shim has held back long enough
+    def flush(self):
+        now = time.perf_counter()
+        while self.queue and self.queue[0][0] <= now:
+            _, _, data, address = heapq.heappop(self.queue)
+            self._sendto(data, address)
+
+    def _sendto(self, data, address):
+        try:
+            self.sock.sendto(data, address)
+        except (BlockingIOError, ConnectionError):
+            self.dropped += 1
+
+    # everything that's arrived, as (data, address)
+    def receive(self):
+        while True:
+            try:
+                yield self.sock.recvfrom(MAX_DATAGRAM)
+            except BlockingIOError:
+                return
+            except ConnectionError:
+                # the last thing sent bounced off a closed port
+                continue
+
+    def close(self):
+        self.sock.close()
+
+
+### --- SERVER --- ###
+class RemoteClient:
+    def __init__(self, address, player: "main.Player"):
+        self.address = address
+        self.player = player
+        self.acked = 0
+        self.input_seq = None
+        self.shots = None
+        self.pending_shots = 0
+        self.held = 0
+        self.last_heard = time.perf_counter()
+        self.bytes = defaultdict(int)   # kind (or "header") -> bytes sent
+        self.snapshots = 0
+        self.full_snapshots = 0
+        self.bytes_in = 0
+
+    # the held controls, plus one of any shots still owed - a lost packet never loses a shot, just delays it
+    def next_inputs(self):
+        inputs = main.Inputs.from_bits(self.held)
+        if self.pending_shots:
+            inputs.fire = True
+            self.pending_shots -= 1
+        return inputs
+
+# runs the world for every client. the world is quantised once per snapshot, and each delta is encoded once per
+# baseline rather than once per client - clients that have all acked the same snapshot get the same packet
+class NetServer:
+    def __init__(self, sim: "main.Simulation", link: Link, host=True):
+        self.sim = sim
+        self.link = link
+        # a dedicated server hands the host's ship to the first client to join
+        self.host = host
+        self.clients = {}
+        self.history = OrderedDict()   # snapshot sequence -> (tick, points, state)
+        self.seq = 0
+        self.next_ids = dict.fromkeys(KINDS, 1)
+        self.sim_time = 0.0
+        self.net_time = 0.0
+        self.sends = 0
+        self.encodes = 0
+
+    # 16 bit, counted per kind and wrapping - an object would have to outlive 65535 newer ones of its kind to share an id
+    def net_id(self, kind, obj):
+        if obj.net_id is None:
+            obj.net_id = self.next_ids[kind]
+            self.next_ids[kind] = obj.net_id % 65535 + 1
+        return obj.net_id
+
+    def owned(self, player):
+        return any(client.player is player for client in self.clients.values())
+
+    def receive(self):
+        now = time.perf_counter()
+        for data, address in self.link.receive():
+            if not data:
+                continue
+            kind = data[0]
+            client = self.clients.get(address)
+            if kind == JOIN:
+                if client is None:
+                    player = self.sim.player if not self.host and not self.owned(self.sim.player) else self.sim.add_player()
+                    client = self.clients[address] = RemoteClient(address, player)
+                # joins get re-sent until the welcome arrives, so this has to be safe to repeat
+                self.link.send(WELCOME_PACKET.pack(WELCOME, self.net_id("players", client.player)), address)
+            elif client is None:
+                continue
+            elif kind == INPUT and len(data) == INPUT_PACKET.size:
+                self.on_input(client, data)
+            elif kind == LEAVE:
+                self.drop(client)
+                continue
+            client.last_heard = now
+            client.bytes_in += len(data)
+        for client in [c for c in self.clients.values() if now - c.last_heard > CLIENT_TIMEOUT]:
+            self.drop(client)
+
+    def on_input(self, client: RemoteClient, data):
+        _, seq, ack, shots, held = INPUT_PACKET.unpack(data)
+        # anything older than what's already been heard arrived out of order
+        if client.input_seq is not None and (seq - client.input_seq) % 65536 >= 32768:
+            return
+        client.input_seq = seq
+        client.acked = max(client.acked, ack)
+        client.held = held & ~FIRE_BIT
+        if client.shots is not None:
+            client.pending_shots = min(3, client.pending_shots + (shots - client.shots) % 65536)
+        client.shots = shots
+
+    def drop(self, client: RemoteClient):
+        del self.clients[client.address]
+        if client.player is self.sim.player:
+            client.player.inputs = main.Inputs()
+        else:
+            self.sim.remove_player(client.player)
+
+    # one tick - inputs is the host's, and gets ignored if a client has the host's ship
+    def step(self, inputs=None):
+        start = time.perf_counter()
+        self.receive()
+        for client in self.clients.values():
+            if client.player is self.sim.player:
+                inputs = client.next_inputs()
+            else:
+                client.player.inputs = client.next_inputs()
+        net = time.perf_counter()
+        self.sim.step(inputs or main.Inputs())
+        sim_done = time.perf_counter()
+        if self.sim.tick % SEND_INTERVAL == 0:
+            self.send_snapshots()
+        self.link.flush()
+        end = time.perf_counter()
+        self.sim_time += sim_done - net
+        self.net_time += (net - start) + (end - sim_done)
+
+    # the world as the clients see it, sorted by id
+    def capture(self):
+        sim = self.sim
+        state = {}
+        for kind, objects in (("players", sim.players), ("rocks", sim.rocks), ("enemies", sim.enemies),
+                              ("lasers", sim.lasers), ("scrap", sim.scrap)):
+            rows = np.zeros(len(objects), dtype=KINDS[kind])
+            if objects:
+                rows["id"] = [self.net_id(kind, obj) for obj in objects]
+                pos = main.body_positions(objects)
+                steps = 1 << 8 * rows.dtype["facing"].itemsize
+                rows["facing"] = np.round(np.array([obj.phys.facing for obj in objects]) * (steps / 360)) % steps
+                if kind in ("players", "enemies"):
+                    hp = np.array([obj.health.hp / obj.health.max_hp for obj in objects])
+                    rows["hp"] = np.clip(np.round(hp * 255), 0, 255)
+                elif kind == "rocks":
+                    rows["scale"] = np.clip(np.round(np.array([rock.graphics.scale for rock in objects]) * 100), 0, 255)
+                    rows["breaking"] = [rock.is_breaking for rock in objects]
+                elif kind == "lasers":
+                    rows["owner"] = [OWNERS.index(laser.owner) for laser in objects]
+                    vel = np.array([(laser.phys.vel.x, laser.phys.vel.y) for laser in objects])
+                    age = np.round(np.array([laser.distance_travelled for laser in objects]) / np.hypot(vel[:, 0], vel[:, 1]))
+                    pos = pos - vel * age[:, None]
+                    rows["born"] = (sim.tick - age) % 65536
+                pos = np.clip(np.round(pos * POS_SCALE), -32768, 32767)
+                rows["x"] = pos[:, 0]
+                rows["y"] = pos[:, 1]
+            state[kind] = rows[np.argsort(rows["id"], kind="stable")]
+        return state
+
+    def encode(self, seq, baseline):
+        tick, points, state = self.history[seq]
+        base = self.history[baseline][2] if baseline else None
+        parts = [SNAP_PACKET.pack(SNAP, seq, baseline, tick, points)]
+        sizes = {"header": SNAP_PACKET.size}
+        for kind, dtype in KINDS.items():
+            chunk = encode_kind(dtype, base[kind] if base else np.zeros(0, dtype=dtype), state[kind])
+            sizes[kind] = len(chunk)
+            parts.append(chunk)
+        self.encodes += 1
+        return b"".join(parts), sizes
+
+    def send_snapshots(self):
+        if not self.clients:
+            return
+        self.seq += 1
+        self.history[self.seq] = (self.sim.tick, self.sim.points, self.capture())
+        while len(self.history) > HISTORY:
+            self.history.popitem(last=False)
+        packets = {}
+        for client in self.clients.values():
+            # a client that hasn't acked anything still in the history gets the whole world
+            baseline = client.acked if client.acked in self.history else 0
+            if baseline not in packets:
+                packets[baseline] = self.encode(self.seq, baseline)
+            packet, sizes = packets[baseline]
+            self.link.send(packet, client.address)
+            for kind, size in sizes.items():
+                client.bytes[kind] += size
+            client.snapshots += 1
+            client.full_snapshots += not baseline
+        self.sends += 1
+
+
+### --- CLIENT --- ###
+# the client's end - sends controls and acks, and rebuilds the world from whichever deltas it can decode
+class NetClient:
+    def __init__(self, server, link: Link):
+        self.server = server
+        self.link = link
+        self.player_id = None
+        self.states = OrderedDict()   # snapshot sequence -> state, for later deltas to be applied to
+        self.newest = 0
+        self.tick = 0
+        self.points = 0
+        self.received_at = 0.0
+        self.input_seq = 0
+        self.shots = 0
+        self.held = None
+        self.last_sent = 0.0
+        self.last_join = None
+        self.ack_due = False
+        self.bytes_in = 0
+
+    @property
+    def state(self):
+        return self.states.get(self.newest)
+
+    # True if a newer snapshot came in
+    def poll(self):
+        now = time.perf_counter()
+        if self.player_id is None and (self.last_join is None or now - self.last_join > JOIN_RETRY):
+            self.link.send(PACKET_TYPE.pack(JOIN), self.server)
+            self.last_join = now
+        updated = False
+        for data, address in self.link.receive():
+            if address != self.server or not data:
+                continue
+            self.bytes_in += len(data)
+            if data[0] == WELCOME:
+                _, self.player_id = WELCOME_PACKET.unpack(data)
+            elif data[0] == SNAP and self.player_id is not None:
+                updated = self.decode(data) or updated
+        if updated:
+            self.received_at = now
+        self.link.flush()
+        return updated
+
+    def decode(self, data):
+        _, seq, baseline, tick, points = SNAP_PACKET.unpack_from(data)
+        # late, repeated, or against a baseline that's already been let go - the next one will do
+        if seq <= self.newest or (baseline and baseline not in self.states):
+            return False
+        base = self.states[baseline] if baseline else None
+        offset = SNAP_PACKET.size
+        state = {}
+        for kind, dtype in KINDS.items():
+            state[kind], offset = decode_kind(dtype, base[kind] if base else np.zeros(0, dtype=dtype), data, offset)
+        self.states[seq] = state
+        while len(self.states) > HISTORY:
+            self.states.popitem(last=False)
+        self.newest = seq
+        self.tick = tick
+        self.points = points
+        self.ack_due = True
+        return True
+
+    # controls only go out when they change, a shot is fired, a new snapshot needs acking, or to keep the line open
+    def send_inputs(self, inputs: "main.Inputs"):
+        if self.player_id is None:
+            return
+        if inputs.fire:
+            self.shots = (self.shots + 1) % 65536
+        held = inputs.to_bits() & ~FIRE_BIT
+        now = time.perf_counter()
+        if held == self.held and not inputs.fire and not self.ack_due and now - self.last_sent < KEEPALIVE:
+            return
+        self.input_seq = (self.input_seq + 1) % 65536
+        self.link.send(INPUT_PACKET.pack(INPUT, self.input_seq, self.newest, self.shots, held), self.server)
+        self.link.flush()
+        self.held = held
+        self.last_sent = now
+        self.ack_due = False
+
+    def leave(self):
+        # straight out rather than through the shim, there won't be another flush
+        self.link._sendto(PACKET_TYPE.pack(LEAVE), self.server)
+        self.link.close()
+
+# keeps a GameCtrl's objects in step with the client's newest snapshot, one object per net id. every snapshot is
+# treated like a tick, so draw_window's interpolation blends from the last one to it
+class ClientWorld:
+    def __init__(self, game: "main.GameCtrl", client: NetClient):
+        self.game = game
+        self.client = client
+        self.objects = {kind: {} for kind in KINDS}
+
+    # how far to blend between the last two snapshots
+    def alpha(self):
+        return min(1.0, (time.perf_counter() - self.client.received_at) / (SEND_INTERVAL * main.SIM_DT))
+
+    def apply(self):
+        game = self.game
+        for kind, rows in self.client.state.items():
+            objects = self.objects[kind]
+            ids = rows["id"].tolist()
+            live = set(ids)
+            for net_id in [net_id for net_id in objects if net_id not in live]:
+                self.remove(kind, objects.pop(net_id))
+            fields = [rows[name].tolist() for name in rows.dtype.names]
+            steps = 1 << 8 * rows.dtype["facing"].itemsize
+            for net_id, x, y, facing, *extra in zip(*fields):
+                pos = (x / POS_SCALE, y / POS_SCALE)
+                facing = facing * 360 / steps
+                obj = objects.get(net_id)
+                if obj is None:
+                    obj = objects[net_id] = self.create(kind, net_id, pos, facing, extra)
+                    obj.phys.place(pos, (0, 0), facing)
+                else:
+                    obj.phys.remember()
+                    # assigned, not updated in place - on a WorldBody pos is a copy of the row
+                    obj.phys.pos = pygame.Vector2(pos)
+                    obj.phys.facing = facing
+                self.update(kind, obj, facing, extra)
+            if kind == "players":
+                # this machine's ship always comes first
+                game.players[:] = [game.player] + [objects[i] for i in ids if objects[i] is not game.player]
+            else:
+                getattr(game, kind)[:] = [objects[i] for i in ids]
+        game.tick = self.client.tick
+        game.points = self.client.points
+
+    def create(self, kind, net_id, pos, facing, extra):
+        game = self.game
+        if kind == "players":
+            return game.player if net_id == self.client.player_id else main.Player(game.physics_world)
+        if kind == "rocks":
+            return main.Rock.blank(game.physics_world)
+        if kind == "enemies":
+            return game.enemy_pool.acquire(pos, game)
+        if kind == "lasers":
+            return game.laser_pool.acquire(pos, facing, owner=OWNERS[extra[0]])
+        return game.scrap_pool.acquire(pos, (0, 0))
+
+    def update(self, kind, obj, facing, extra):
+        if kind in ("players", "enemies"):
+            obj.health.hp = extra[0] / 255 * obj.health.max_hp
+        elif kind == "rocks":
+            obj.graphics.scale = extra[0] / 100
+            if extra[1] and not obj.is_breaking:
+                obj.is_breaking = True
+                self.game.debris.emit(obj.phys.pos, 12)
+        elif kind == "lasers":
+            # x and y were where it was fired from, so carry it on along its facing for as long as it's been flying -
+            # a new one was placed with no velocity
+            obj.dir = pygame.Vector2(1, 0).rotate(facing)
+            obj.phys.vel = obj.dir * main.Laser.speed
+            obj.phys.pos += obj.phys.vel * ((self.client.tick - extra[1]) % 65536)
+
+    # an enemy only ever leaves by being destroyed. ships and rocks aren't pooled, they just give their row back
+    def remove(self, kind, obj):
+        game = self.game
+        if kind == "enemies":
+            game.debris.emit(obj.phys.pos, 9, colour=(200,120,120))
+            game.enemy_pool.release(obj)
+        elif kind == "lasers":
+            game.laser_pool.release(obj)
+        elif kind == "scrap":
+            game.scrap_pool.release(obj)
+        else:
+            obj.phys.release()
+
+
+### --- GAME LOOPS --- ###
+# GameCtrl.main_loop with the server in charge of ticking, and no rewinding or recording
+def host_loop(game: "main.GameCtrl", server: NetServer):
+    accumulator = 0.0
+    previous = time.perf_counter()
+    fire = False
+    while True:
+        frame_start = time.perf_counter()
+        accumulator += frame_start - previous
+        previous = frame_start
+
+        inputs = game.check_events()
+        fire = fire or inputs.fire
+        sim_start = time.perf_counter()
+        steps = 0
+        while accumulator >= main.SIM_DT and steps < main.MAX_CATCHUP_STEPS:
+            inputs.fire = fire
+            fire = False
+            server.step(inputs)
+            accumulator -= main.SIM_DT
+            steps += 1
+        if steps == main.MAX_CATCHUP_STEPS:
+            accumulator = min(accumulator, main.SIM_DT)
+        server.link.flush()
+
+        draw_start = time.perf_counter()
+        game.draw_window(accumulator / main.SIM_DT)
+        frame_time = time.perf_counter() - frame_start
+        if game.governor:
+            game.governor.update({"sim": draw_start - sim_start, "draw": time.perf_counter() - draw_start})
+        game.clock.tick(main.RENDER_FPS)
+        main.profiler.end_frame(frame_time, game.entity_counts(), game.clock.get_fps())
+
+def serve_headless(server: NetServer):
+    next_tick = time.perf_counter()
+    while True:
+        server.step()
+        next_tick += main.SIM_DT
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+
+# nothing gets simulated here but the debris, which only exists on this side
+def client_loop(game: "main.GameCtrl", client: NetClient):
+    world = ClientWorld(game, client)
+    accumulator = 0.0
+    previous = time.perf_counter()
+    try:
+        while True:
+            frame_start = time.perf_counter()
+            accumulator += frame_start - previous
+            previous = frame_start
+
+            client.send_inputs(game.check_events())
+            sim_start = time.perf_counter()
+            if client.poll():
+                world.apply()
+            while accumulator >= main.SIM_DT:
+                game.debris.update()
+                accumulator -= main.SIM_DT
+
+            draw_start = time.perf_counter()
+            game.draw_window(world.alpha())
+            frame_time = time.perf_counter() - frame_start
+            # the server's world is out of reach, but shedding the client's own debris and sprites still helps
+            if game.governor:
+                game.governor.update({"sim": draw_start - sim_start, "draw": time.perf_counter() - draw_start})
+            game.clock.tick(main.RENDER_FPS)
+            main.profiler.end_frame(frame_time, game.entity_counts(), game.clock.get_fps())
+    finally:
+        client.leave()
+
+
+### --- LOOPBACK TEST --- ###
+# each bot spins its own way, thrusts on and off and fires every ten frames
+def bot_inputs(i, frame):
+    return main.Inputs(left=i % 2 == 1, right=i % 2 == 0, forward=(frame // 60 + i) % 3 == 0, fire=frame % 10 == i % 10)
+
+# a headless server and count bot clients in this process, every socket shimmed, ticking in real time
+def loopback(count, seconds, latency=0.0, jitter=0.0, loss=0.0, seed=1234):
+    shim = {"latency": latency, "jitter": jitter, "loss": loss}
+    sim = main.Simulation(seed)
+    server = NetServer(sim, Link(("127.0.0.1", 0), seed=seed, **shim), host=False)
+    clients = [NetClient(server.link.address, Link(("127.0.0.1", 0), seed=seed + i + 1, **shim)) for i in range(count)]
+    # the first client's snapshots also go through a ClientWorld, to check what it would show matches the server
+    mirror = ClientWorld(main.Simulation(seed), clients[0])
+
+    start = time.perf_counter()
+    next_tick = start
+    frame = 0
+    while time.perf_counter() - start < seconds:
+        for i, client in enumerate(clients):
+            if client.poll() and client is mirror.client:
+                mirror.apply()
+            client.send_inputs(bot_inputs(i, frame))
+        server.step()
+        frame += 1
+        next_tick += main.SIM_DT
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+    elapsed = time.perf_counter() - start
+
+    # let everything still in flight land, then check every client ended up with exactly what was sent
+    settle = time.perf_counter() + 2 * latency + jitter + 0.05
+    while time.perf_counter() < settle:
+        server.link.flush()
+        for client in clients:
+            if client.poll() and client is mirror.client:
+                mirror.apply()
+        time.sleep(0.002)
+    in_sync = 0
+    for client in clients:
+        sent = server.history.get(client.newest)
+        in_sync += sent is not None and all(np.array_equal(sent[2][kind], client.state[kind]) for kind in KINDS)
+    # the mirror's lasers carried on to the server's tick should be where the server's are, give or take the rounding
+    shown = mirror.objects["lasers"]
+    ahead = sim.tick - mirror.game.tick
+    laser_errors = [(shown[laser.net_id].phys.pos + shown[laser.net_id].phys.vel * ahead - laser.phys.pos).length()
+                    for laser in sim.lasers if laser.net_id in shown]
+
+    remotes = list(server.clients.values())
+    kinds = list(KINDS) + ["header"]
+    per_client = {kind: sum(c.bytes[kind] for c in remotes) / len(remotes) / elapsed for kind in kinds}
+    snapshots = sum(c.snapshots for c in remotes)
+    report = {
+        "clients": count,
+        "seconds": elapsed,
+        "ticks": sim.tick,
+        "shim": shim,
+        "entities": sim.entity_counts() | {"players": len(sim.players)},
+        "server_ms_per_tick": {"sim": server.sim_time / sim.tick * 1000, "net": server.net_time / sim.tick * 1000,
+                               "net_per_client": server.net_time / sim.tick * 1000 / count},
+        "encodes_per_send": server.encodes / max(1, server.sends),
+        "bytes_per_client_per_s": per_client,
+        "bytes_per_snapshot": sum(c.bytes[kind] for c in remotes for kind in kinds) / max(1, snapshots),
+        "full_snapshots": sum(c.full_snapshots for c in remotes),
+        "snapshots_sent": snapshots,
+        "upstream_bytes_per_client_per_s": sum(c.bytes_in for c in remotes) / len(remotes) / elapsed,
+        "packets_dropped": server.link.dropped + sum(c.link.dropped for c in clients),
+        "clients_in_sync": in_sync,
+        "lasers_compared": len(laser_errors),
+        "laser_error_px": max(laser_errors, default=0.0),
+    }
+    for client in clients:
+        client.leave()
+    server.link.close()
+    return report
+
+def print_report(r):
+    shim = r["shim"]
+    print(f"{r['clients']} clients, {r['ticks']} ticks in {r['seconds']:.1f}s, "
+          f"latency {shim['latency'] * 1000:.0f}±{shim['jitter'] * 1000:.0f} ms one way, {shim['loss']:.0%} loss")
+    print(f"world: {', '.join(f'{k} {v}' for k, v in r['entities'].items())}")
+    ms = r["server_ms_per_tick"]
+    print(f"server: sim {ms['sim']:.3f} ms/tick, net {ms['net']:.3f} ms/tick ({ms['net_per_client']:.4f} per client), "
+          f"{r['encodes_per_send']:.1f} encodes per snapshot")
+    print(f"\n{'downstream':<12}{'B/s':>9}  per client")
+    for kind, rate in r["bytes_per_client_per_s"].items():
+        print(f"  {kind:<10}{rate:>9.0f}")
+    print(f"  {'total':<10}{sum(r['bytes_per_client_per_s'].values()):>9.0f}  ({r['bytes_per_snapshot']:.0f} B/snapshot, "
+          f"{r['full_snapshots']} of {r['snapshots_sent']} full)")
+    print(f"{'upstream':<12}{r['upstream_bytes_per_client_per_s']:>9.0f}")
+    print(f"\n{r['packets_dropped']} packets dropped by the shim, {r['clients_in_sync']}/{r['clients']} clients in sync with the server")
+    print(f"client lasers within {r['laser_error_px']:.2f} px of the server's ({r['lasers_compared']} compared)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--serve", action="store_true", help="host a game")
+    parser.add_argument("--headless", action="store_true", help="with --serve, run a dedicated server with no window")
+    parser.add_argument("--connect", metavar="HOST[:PORT]", help="join a game")
+    parser.add_argument("--loopback", type=int, metavar="CLIENTS", help="run a server and this many bot clients over localhost and report")
+    parser.add_argument("--port", type=int, default=NET_PORT)
+    parser.add_argument("--seed", type=int, help="world seed for --serve and --loopback")
+    parser.add_argument("--seconds", type=float, default=10.0, help="how long --loopback runs")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every packet is held back, one way")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many seconds either side of --latency")
+    parser.add_argument("--loss", type=float, default=0.0, help="fraction of packets dropped")
+    parser.add_argument("--out", metavar="PATH", help="write the --loopback report here as JSON")
+    args = parser.parse_args()
+    shim = {"latency": args.latency, "jitter": args.jitter, "loss": args.loss}
+
+    if args.loopback:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        pygame.init()
+        report = loopback(args.loopback, args.seconds, seed=1234 if args.seed is None else args.seed, **shim)
+        print_report(report)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(report, f, indent=2)
+    elif args.serve:
+        link = Link(("0.0.0.0", args.port), **shim)
+        if args.headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            pygame.init()
+            server = NetServer(main.Simulation(args.seed), link, host=False)
+            print(f"serving on port {args.port}")
+            serve_headless(server)
+        else:
+            game = main.GameCtrl(args.seed)
+            host_loop(game, NetServer(game, link))
+    elif args.connect:
+        host, _, port = args.connect.partition(":")
+        client = NetClient((socket.gethostbyname(host), int(port or args.port)), Link(**shim))
+        client_loop(main.GameCtrl(), client)
+    else:
+        parser.error("one of --serve, --connect or --loopback is needed")